@@ -0,0 +1,77 @@
+# Name: leapfrog.py
+# Leapfrog time stepping of the 1D wave equation for a batch of strings at once
+
+import numpy as np
+
+
+class Wave:
+    """
+    Steps u_tt = c^2 u_xx with fixed ends for a batch of strings, every row of u0 is one string.
+    u0 can be one string (n,) or a batch (B, n), c a single speed or one per string.
+    The first step has no u_before yet, it is taken as u_now + (c dt/dx)^2 (u[i+1] - 2u[i] + u[i-1]),
+    after that the usual leapfrog 2u_now - u_before + (c dt/dx)^2 (...). Whether the next step is the
+    first one is kept in the first flag instead of comparing the two states.
+    The three states rotate through preallocated buffers, step does no allocations.
+    """
+
+    def __init__(self, u0, c, dt, dx):
+        u0 = np.asarray(u0, dtype=float)
+        self.single = u0.ndim == 1
+        u0 = np.atleast_2d(u0)
+        self.r2 = (np.reshape(np.asarray(c, dtype=float), (-1, 1)) * (dt / dx)) ** 2
+        if self.r2.shape[0] not in (1, u0.shape[0]):
+            raise ValueError(f"Got {self.r2.shape[0]} speeds for {u0.shape[0]} strings")
+        self.before = u0.copy()
+        self.now = u0.copy()
+        self.next = u0.copy()
+        self.scratch = np.empty_like(u0[:, 1:-1])
+        self.dt = dt
+        self.first = True
+        self.steps = 0
+
+    @property
+    def u(self):
+        """Current state, (n,) when a single string was given"""
+        return self.now[0] if self.single else self.now
+
+    @property
+    def time(self):
+        return self.steps * self.dt
+
+    def step(self, steps=1):
+        for _ in range(steps):
+            laplace = self.scratch
+            # u[i+1] - 2u[i] + u[i-1] in the same order as the per point loop, so the results are the same
+            np.multiply(self.now[:, 1:-1], 2, out=laplace)
+            np.subtract(self.now[:, 2:], laplace, out=laplace)
+            np.add(laplace, self.now[:, :-2], out=laplace)
+            np.multiply(laplace, self.r2, out=laplace)
+
+            inner = self.next[:, 1:-1]
+            if self.first:
+                np.add(self.now[:, 1:-1], laplace, out=inner)
+                self.first = False
+            else:
+                np.multiply(self.now[:, 1:-1], 2, out=inner)
+                np.subtract(inner, self.before[:, 1:-1], out=inner)
+                np.add(inner, laplace, out=inner)
+            # the ends stay where they started
+            self.next[:, 0] = self.before[:, 0]
+            self.next[:, -1] = self.before[:, -1]
+
+            self.before, self.now, self.next = self.now, self.next, self.before
+            self.steps += 1
+        return self.u
+
+    def run(self, steps, every=None):
+        """Does steps steps, with every also returns the states of every every-th step as a (k, B, n) array"""
+        if every is None:
+            self.step(steps)
+            return self.u
+        saved = np.empty((steps // every + 1,) + self.now.shape)
+        saved[0] = self.now
+        for k in range(1, len(saved)):
+            self.step(every)
+            saved[k] = self.now
+        self.step(steps - (len(saved) - 1) * every)
+        return saved[:, 0] if self.single else saved
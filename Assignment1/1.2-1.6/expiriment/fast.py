@@ -3,7 +3,10 @@
 
 import numpy as np
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from modules.animate import live
 
 y_top= 1
 y_bottom = 0
@@ -16,12 +19,14 @@ def initialize_matrix(n):
     matrix[0] = 1
     return matrix
 
-def next_time_step(matrix, step_t, step_x, d):
+def next_time_step(matrix, step_t, step_x, d, matrix_next=None):
     """
     Calculate the next time step of the matrix with Numpy vectorization.
     Thought it would reduce the complexity but seems to be the same, just faster c pointers. (O(n^2)) 
+    Pass matrix_next to write into an existing buffer instead of allocating a new one.
     """
-    matrix_next = np.zeros(matrix.shape)
+    if matrix_next is None:
+        matrix_next = np.zeros(matrix.shape)
     matrix_next[0] = matrix[0]
     constant = d * step_t / (step_x**2)
     matrix_next[-1] = matrix[-1]
@@ -31,17 +36,18 @@ def next_time_step(matrix, step_t, step_x, d):
     return matrix_next
 
 
-# plot the matrix next with update function in animate
-def update(frame):
-    global matrix
-    matrix = next_time_step(matrix, step_t, step_x, 1)
-    plt.imshow(matrix, cmap='hot', interpolation='nearest')
+# the solver steps in a thread, the plot reuses one imshow and shows the newest matrix
+def step():
+    global matrix, buffer
+    matrix, buffer = next_time_step(matrix, step_t, step_x, 1, buffer), matrix
     return matrix
 
 
 fig, ax = plt.subplots()
 #initialize the matrix
 matrix = initialize_matrix(10)
-ani = FuncAnimation(fig, update, frames=1000, interval=1, blit=False)
+buffer = np.zeros(matrix.shape)
+im = ax.imshow(matrix, cmap='hot', interpolation='nearest')
+ani = live(fig, im, step, frames=1000, interval=1)
 
 plt.show()
@@ -0,0 +1,109 @@
+# Name: animate.py
+# Runs the solver in a background thread and lets the animation only draw the newest frame
+
+import threading
+import numpy as np
+from matplotlib.animation import FuncAnimation, FFMpegWriter, PillowWriter
+from .snapshots import SnapshotStore
+
+
+class RingBuffer:
+    """
+    Bounded buffer of the last capacity frames in one preallocated (capacity, *shape) array.
+    put overwrites the oldest frame, so a slow reader never holds up the solver,
+    latest gives the newest frame and skips everything the reader did not get to.
+    """
+
+    def __init__(self, shape, capacity=8, dtype=float):
+        self.frames = np.empty((capacity,) + tuple(shape), dtype=dtype)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def put(self, frame):
+        with self.lock:
+            self.frames[self.count % len(self.frames)] = frame
+            self.count += 1
+
+    def latest(self, out):
+        """Copies the newest frame into out and returns its number, None when nothing was put yet"""
+        with self.lock:
+            if self.count == 0:
+                return None
+            out[...] = self.frames[(self.count - 1) % len(self.frames)]
+            return self.count - 1
+
+
+class Producer(threading.Thread):
+    """Calls step() (which returns the new state) frames times, or until stop, and puts every state in the ring"""
+
+    def __init__(self, step, ring, frames=None):
+        super().__init__(daemon=True)
+        self.step_function = step
+        self.ring = ring
+        self.frames = frames
+        self.stopped = threading.Event()
+
+    def run(self):
+        done = 0
+        while not self.stopped.is_set() and (self.frames is None or done < self.frames):
+            self.ring.put(self.step_function())
+            done += 1
+
+    def stop(self):
+        self.stopped.set()
+
+
+def live(fig, im, step, frames=None, interval=1, overlay=None, capacity=8):
+    """
+    Animates im (an existing imshow artist) while step runs in a Producer thread.
+    Every draw takes the newest frame from the ring buffer, so the solver is not slowed down by the drawing
+    and the drawing skips the frames it can not keep up with. overlay(frame) can recolour a frame
+    (vectorized, for example lambda m: np.where(mask == 0, -1, m)) before it is shown.
+    The same artist is reused every frame. Returns the FuncAnimation, keep a reference to it.
+    """
+    shape = np.shape(im.get_array())
+    ring = RingBuffer(shape, capacity)
+    shown = np.empty(shape)
+    producer = Producer(step, ring, frames)
+    last = [None]
+
+    def update(_):
+        number = ring.latest(shown)
+        if number is not None and number != last[0]:
+            last[0] = number
+            im.set_array(shown if overlay is None else overlay(shown))
+        return [im]
+
+    ani = FuncAnimation(fig, update, interval=interval, blit=False, cache_frame_data=False)
+    ani.producer = producer
+    fig.canvas.mpl_connect("close_event", lambda event: (producer.stop(), ani.event_source.stop()))
+    producer.start()
+    return ani
+
+
+def record(step, frames, path, every=1, fig=None, im=None, overlay=None, fps=30, dt=None, dx=None):
+    """
+    Headless version of live, no window and no frame skipping: runs step frames times and keeps every
+    every-th state. A path ending in .mp4 or .gif is written as a video through im (needs fig and im),
+    any other path is a SnapshotStore folder with the raw frames.
+    """
+    if path.endswith((".mp4", ".gif")):
+        writer = FFMpegWriter(fps=fps) if path.endswith(".mp4") else PillowWriter(fps=fps)
+        with writer.saving(fig, path, dpi=fig.dpi):
+            for k in range(frames):
+                frame = step()
+                if k % every == 0:
+                    im.set_array(frame if overlay is None else overlay(frame))
+                    writer.grab_frame()
+        return path
+
+    store = None
+    for k in range(frames):
+        frame = step()
+        if k % every == 0:
+            if store is None:
+                store = SnapshotStore.create(path, np.shape(frame), np.asarray(frame).dtype, dt, dx)
+            store.append(k + 1, frame)
+    if store is not None:
+        store.close()
+    return path
@@ -0,0 +1,84 @@
+# Name: cache.py
+# Caches generated data by a hash of the generating function, its parameters and the solver source
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+
+import numpy as np
+
+CACHE_DIR = "data/cache"
+MAX_BYTES = 2 * 1024**3
+MODULES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def source_version():
+    """Hash of all the solver code in modules/, any change there makes older results stale"""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(MODULES_DIR)):
+        if name.endswith(".py"):
+            with open(os.path.join(MODULES_DIR, name), "rb") as f:
+                digest.update(name.encode() + f.read())
+    return digest.hexdigest()
+
+
+def _encode(value):
+    """json for the parameters json can not do itself: arrays by their dtype, shape and a hash of their data"""
+    if isinstance(value, np.ndarray):
+        data = hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest()
+        return {"dtype": value.dtype.str, "shape": list(value.shape), "data": data}
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Can not use a {type(value).__name__} as a cached parameter")
+
+
+def cache_key(function, params):
+    """Hash of the function name and source, the parameters and the solver source version"""
+    description = json.dumps({"name": function.__qualname__,
+                              "source": inspect.getsource(function),
+                              "params": params,
+                              "version": source_version()}, sort_keys=True, default=_encode)
+    return hashlib.sha256(description.encode()).hexdigest()[:32]
+
+
+def cached(function, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES, **params):
+    """
+    Returns function(**params), a dict of name to array, from the cache if it was computed before.
+    The arrays are loaded memory-mapped. New results are stored and the least recently used results
+    are removed when the cache gets bigger than max_bytes.
+    """
+    path = os.path.join(cache_dir, cache_key(function, params))
+    if os.path.isdir(path):
+        os.utime(path)
+        return {name[:-len(".npy")]: np.load(os.path.join(path, name), mmap_mode="r")
+                for name in os.listdir(path) if name.endswith(".npy")}
+
+    results = {name: np.asarray(value) for name, value in function(**params).items()}
+    os.makedirs(cache_dir, exist_ok=True)
+    # write to a temporary folder first so an interrupted run never leaves half a result
+    partial = path + ".partial"
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+    for name, value in results.items():
+        np.save(os.path.join(partial, name + ".npy"), value)
+    os.replace(partial, path)
+    evict(cache_dir, max_bytes)
+    return results
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+    """Removes the least recently used results until the cache is at most max_bytes"""
+    entries = []
+    for key in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, key)
+        if os.path.isdir(path) and not key.endswith(".partial"):
+            size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+            entries.append((os.path.getmtime(path), size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path)
+        total -= size
@@ -0,0 +1,80 @@
+# Name: direct.py
+# Solves the steady state diffusion (Laplace) problem exactly with a sparse LU factorization
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.linalg import splu
+
+# factorizations by (shape, hash of the mask), oldest is dropped first
+_factorizations = OrderedDict()
+_max_factorizations = 16
+
+
+def laplace_operator(shape, mask):
+    """
+    Assembles the 5-point system of the fixed point the iterative solvers converge to:
+    4 u[i,j] - mask[i,j] * (sum of the four neighbours) = 0 for the unknowns rows 1..n-2, columns 0..n-2.
+    Column n-1 is the copy of column 0 (periodic in x), rows 0 and n-1 are fixed and end up in the right hand side.
+    Returns the sparse matrix in CSC format.
+    """
+    n_rows, n_cols = shape
+    width = n_cols - 1
+    rows, cols = np.mgrid[0:n_rows-2, 0:width]
+    index = (rows * width + cols).ravel()
+    weight = np.asarray(mask, dtype=float)[1:-1, :-1].ravel()
+
+    row_idx = [index]
+    col_idx = [index]
+    values = [np.full(index.shape, 4.0)]
+    for di, dj in [(-1, 0), (1, 0), (0, 1), (0, -1)]:
+        i = (rows + di).ravel()
+        j = ((cols + dj) % width).ravel()
+        inside = (i >= 0) & (i < n_rows - 2)
+        row_idx.append(index[inside])
+        col_idx.append(i[inside] * width + j[inside])
+        values.append(-weight[inside])
+
+    size = (n_rows - 2) * width
+    return coo_matrix((np.concatenate(values), (np.concatenate(row_idx), np.concatenate(col_idx))), shape=(size, size)).tocsc()
+
+
+def factorize(shape, mask):
+    """LU factorization of laplace_operator, cached so repeated solves for the same grid and mask only back-substitute."""
+    mask = np.ascontiguousarray(mask, dtype=float)
+    key = (tuple(shape), hashlib.sha1(mask.tobytes()).hexdigest())
+    if key in _factorizations:
+        _factorizations.move_to_end(key)
+        return _factorizations[key]
+
+    lu = splu(laplace_operator(shape, mask))
+    _factorizations[key] = lu
+    if len(_factorizations) > _max_factorizations:
+        _factorizations.popitem(last=False)
+    return lu
+
+
+def direct_solve(matrix, mask=None, omega=1):
+    """
+    Exact steady state for the boundary rows of matrix, the solution Jacob_Eq_TOL, Gauss_Eq_TOL and
+    SOR_Eq_TOL converge to. The factorization is only computed once per grid size and mask.
+    With an insulator (0 < mask < 1) the SOR fixed point u = mask * ((1-omega) u + omega * avg) depends on omega,
+    so pass the omega of the SOR run to get its limit.
+    """
+    matrix = np.array(matrix, dtype=float)
+    if mask is None:
+        mask = np.ones_like(matrix)
+    mask = np.asarray(mask, dtype=float)
+    mask = mask * omega / (1 - mask * (1 - omega))
+
+    # the fixed rows enter the equations of their neighbours on the right hand side
+    rhs = np.zeros_like(matrix[1:-1, :-1])
+    rhs[0] += mask[1, :-1] * matrix[0, :-1]
+    rhs[-1] += mask[-2, :-1] * matrix[-1, :-1]
+
+    solution = factorize(matrix.shape, mask).solve(rhs.ravel())
+    matrix[1:-1, :-1] = solution.reshape(rhs.shape)
+    matrix[1:-1, -1] = matrix[1:-1, 0]
+    return matrix
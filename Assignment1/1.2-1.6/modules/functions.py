@@ -2,20 +2,19 @@
 # Has the different equations for this exercise
 
 import numpy as np
+from .masks import Mask, _red_black_phases
 
-def TDDE_Eq(matrix, dt, dx, D):
+def TDDE_Eq(matrix, dt, dx, D, method="explicit"):
+    """method = "adi" is the implicit ADI scheme, which is stable for every dt"""
     cons = dt*D/(dx**2)
+    next_matrix = np.copy(matrix)
+    if method == "adi":
+        _adi_step(matrix, next_matrix, cons)
+        return next_matrix
     if cons > 1:
         return r"Unstable"
     else:
-        n = len(matrix)
-        next_matrix = np.copy(matrix)
-        
-        for j in range (1, n-1):
-            next_matrix[j,0] = matrix[j,0] + cons * (matrix[j,1] + matrix[j,-2] + matrix[j+1,0] + matrix[j-1,0] - 4 * matrix[j,0])            
-            for i in range (1, n-1):
-                next_matrix[j,i] = matrix[j,i] + cons * (matrix[j,i+1] + matrix[j,i-1] + matrix[j+1,i] + matrix[j-1,i] - 4 * matrix[j,i])
-            next_matrix[j,-1] = next_matrix[j,0]
+        _diffusion_step(matrix, next_matrix, cons)
         return next_matrix
     
 
@@ -23,90 +22,237 @@ def TIDE_Eq(matrix, mask=None):
     new_matrix = np.copy(matrix)
     if mask is None:
         mask = np.ones_like(matrix)
-    for i in range(1, len(matrix)-1):
-        new_matrix[i,0] = mask[i,j] * (matrix[i-1,0] + matrix[i+1,0] + matrix[i,1] + matrix[i,-2]) / 4
-        for j in range(1, len(matrix)-1):
-            new_matrix[i,j] = mask[i,j] *(matrix[i+1,j] + matrix[i-1,j] + matrix[i,j+1] + matrix[i,j-1])/4
-        new_matrix[i,-1] = new_matrix[i,0]
+    _jacobi_step(matrix, new_matrix, np.asarray(mask)[1:-1, :-1] / 4)
     return new_matrix
 
-def Gauss_Eq(matrix, mask=None): 
+def Gauss_Eq(matrix, mask=None):
     new_matrix = np.copy(matrix)
     if mask is None:
         mask = np.ones_like(matrix)
-    for i in range(1, len(matrix)-1):
-        for j in range(1, len(matrix)-1):
-            new_matrix[i,j] = mask[i, j] * (new_matrix[i+1,j] + new_matrix[i-1,j] + new_matrix[i,j+1] + new_matrix[i,j-1])/4
-        new_matrix[i,0] = mask[i, 0] * (new_matrix[i-1,0] + new_matrix[i+1,0] + new_matrix[i,1] + new_matrix[i,-2]) / 4
-        new_matrix[i,-1] = new_matrix[i,0]
+    _relax(new_matrix, 1, mask)
     return new_matrix
 
 def SOR_Eq(matrix, omega=1.5, mask=None):
     new_matrix = np.copy(matrix)
     if mask is None:
         mask = np.ones_like(matrix)
-    for i in range(1, len(matrix)-1):
-        for j in range(1, len(matrix)-1):
-            new_matrix[i,j] = (1-omega) * matrix[i,j] + omega * (new_matrix[i+1,j] + new_matrix[i-1,j] + new_matrix[i,j+1] + new_matrix[i,j-1])/4
-        new_matrix[i,0] = (1-omega) * matrix[i,0] + omega * (new_matrix[i-1,0] + new_matrix[i+1,0] + new_matrix[i,1] + new_matrix[i,-2]) / 4
-        new_matrix[i,-1] = new_matrix[i,0]
+    _relax(new_matrix, omega, mask)
     return new_matrix
 
 
-def Jacob_Eq_TOL(matrix, tol, mask=None):
-    error = tol + 10
-    iterations = 0
-    if mask is None:
-        mask = np.ones_like(matrix)
-    while error > tol and iterations < 10**8:
-        iterations += 1
-        new_matrix = np.copy(matrix)
-        for i in range(1, len(matrix)-1):
-            for j in range(1, len(matrix)-1):
-                new_matrix[i,j] = mask[i,j] * ((matrix[i+1,j] + matrix[i-1,j] + matrix[i,j+1] + matrix[i,j-1])/4)
-            new_matrix[i,0] = mask[i,0] * ((matrix[i-1,0] + matrix[i+1,0] + matrix[i,1] + matrix[i,-2]) / 4)
-            new_matrix[i,-1] = new_matrix[i,0]
-        error = np.max(np.abs(matrix - new_matrix))
-        matrix = new_matrix
-    if iterations == 10**8:
-        return None
-    return iterations
-
-def Gauss_Eq_TOL(matrix, tol, mask=None):
-    error = tol + 10
-    iterations = 0
+def Jacob_Eq_TOL(matrix, tol, mask=None, history=False, telemetry=None):
+    current = np.array(matrix, dtype=float)
+    following = np.copy(current)
+    scratch = np.empty_like(current[1:-1, :-1])
     if mask is None:
         mask = np.ones_like(matrix)
-    while error > tol and iterations < 10**8:
-        iterations += 1
-        new_matrix = np.copy(matrix)
-        for i in range(1, len(matrix)-1):
-            for j in range(1, len(matrix)-1):
-                new_matrix[i,j] = mask[i,j] * ((new_matrix[i+1,j] + new_matrix[i-1,j] + new_matrix[i,j+1] + new_matrix[i,j-1])/4)
-            new_matrix[i,0] = mask[i,0] * ((new_matrix[i-1,0] + new_matrix[i+1,0] + new_matrix[i,1] + new_matrix[i,-2]) / 4)
-            new_matrix[i,-1] = new_matrix[i,0]
-        error = np.max(np.abs(matrix - new_matrix))
-        matrix = new_matrix
-    if iterations == 10**8:
-        return None
-    return iterations
-
-
-def SOR_Eq_TOL(matrix, tol, omega=1.5, mask=None):
-    error = tol + 10
+    weights = np.asarray(mask, dtype=float)[1:-1, :-1] / 4
+
+    def sweep():
+        nonlocal current, following
+        _jacobi_step(current, following, weights)
+        np.subtract(following[1:-1, :-1], current[1:-1, :-1], out=scratch)
+        current, following = following, current
+        return np.max(np.abs(scratch, out=scratch))
+
+    if telemetry is not None:
+        telemetry.start("Jacob_Eq_TOL", n=len(current))
+    return _iterate(sweep, tol, history, telemetry, lambda iterations: {"cells": iterations * weights.size})
+
+def Gauss_Eq_TOL(matrix, tol, mask=None, history=False, telemetry=None):
+    return SOR_Eq_TOL(matrix, tol, 1, mask=mask, history=history, telemetry=telemetry, solver="Gauss_Eq_TOL")
+
+
+def SOR_Eq_TOL(matrix, tol, omega=1.5, mask=None, history=False, telemetry=None, solver="SOR_Eq_TOL"):
+    """
+    omega can also be an iterator giving the omega of every colour (two per sweep), like omega.chebyshev_omegas.
+    solver is the name the telemetry records get (Gauss_Eq_TOL passes its own).
+    """
+    matrix = np.copy(matrix)
+    mask = Mask.of(mask, matrix.shape)
+    omegas = omega if hasattr(omega, "__next__") else None
+    current = [omega]
+
+    def sweep():
+        if omegas is not None:
+            current[0] = (next(omegas), next(omegas))
+        return _relax(matrix, current[0], mask)
+
+    if telemetry is not None:
+        telemetry.start(solver, n=len(matrix))
+        cells = sum(len(phase[0]) for phase in mask.phases)
+    return _iterate(sweep, tol, history, telemetry, lambda iterations: {"omega": float(np.ravel(current[0])[-1]), "cells": iterations * cells})
+
+
+def _iterate(sweep, tol, history=False, telemetry=None, fields=None):
+    """
+    Runs sweep (which returns the largest change) until the change is below tol, at most 10**8 times.
+    Returns the number of iterations, or None when it did not converge.
+    tol can also be a list of tolerances, then it runs until the smallest one and returns the first iteration
+    at which each of them was reached, the same numbers separate runs per tolerance would give.
+    With history=True the largest change of every iteration is returned as well.
+    With a Telemetry every telemetry.every iterations is recorded, plus the end (converged or stalled),
+    fields(iterations) gives the extra values of the solver.
+    """
+    tolerances = np.atleast_1d(tol)
+    smallest = np.min(tolerances)
+    reached = [None] * len(tolerances)
+    errors = []
+    error = smallest + 10
     iterations = 0
-    if mask is None:
-        mask = np.ones_like(matrix)
-    while error > tol and iterations < 10**8:
+    while error > smallest and iterations < 10**8:
         iterations += 1
-        new_matrix = np.copy(matrix)
-        for i in range(1, len(matrix)-1):
-            for j in range(1, len(matrix)-1):
-                new_matrix[i,j] = mask[i][j] * ((1-omega) * matrix[i,j] + omega * (new_matrix[i+1,j] + new_matrix[i-1,j] + new_matrix[i,j+1] + new_matrix[i,j-1])/4)
-            new_matrix[i,0] = mask[i][0] * ((1-omega) * matrix[i,0] + omega * (new_matrix[i-1,0] + new_matrix[i+1,0] + new_matrix[i,1] + new_matrix[i,-2]) / 4)
-            new_matrix[i,-1] = new_matrix[i,0]
-        error = np.max(np.abs(matrix - new_matrix))
-        matrix = new_matrix
-    if iterations == 10**8:
-        return None
-    return iterations
\ No newline at end of file
+        error = sweep()
+        if history:
+            errors.append(error)
+        if telemetry is not None and iterations % telemetry.every == 0:
+            telemetry.record(iterations, error, **fields(iterations))
+        for k, t in enumerate(tolerances):
+            if reached[k] is None and error <= t:
+                reached[k] = iterations
+
+    if telemetry is not None:
+        telemetry.record(iterations, error, "converged" if error <= smallest else "stalled", **fields(iterations))
+    result = reached if np.ndim(tol) else reached[0]
+    if history:
+        return result, np.array(errors)
+    return result
+
+
+def _relax(matrix, omega, mask):
+    """
+    One red-black SOR sweep in place (omega = 1 is Gauss-Seidel), every colour is one numpy update.
+    omega is one number or a pair (omega of the red cells, omega of the black cells).
+    Returns the maximum change of a cell, the same error the TOL functions used before.
+    With a Mask only the cells that are not a sink are updated, the sinks are just set to 0.
+    """
+    flat = matrix.reshape(-1)
+    # the phases are red, black and then the red and black cells of the seam column
+    omegas = np.broadcast_to(omega, 2)
+    if isinstance(mask, Mask):
+        error = mask.clear_sinks(flat)
+        for k, (cells, neighbours, factors) in enumerate(mask.phases):
+            error = max(error, _relax_phase(flat, omegas[k % 2], factors, cells, neighbours))
+    else:
+        mask = np.asarray(mask, dtype=float).reshape(-1)
+        error = 0
+        for k, (cells, neighbours) in enumerate(_red_black_phases(matrix.shape)):
+            error = max(error, _relax_phase(flat, omegas[k % 2], mask[cells], cells, neighbours))
+    matrix[1:-1, -1] = matrix[1:-1, 0]
+    return error
+
+
+def _relax_phase(flat, omega, factors, cells, neighbours):
+    """Updates the cells of one colour in place and returns their largest change, factors is the mask of the cells or None"""
+    if len(cells) == 0:
+        return 0
+    old = flat[cells]
+    new = (1-omega) * old + omega * flat[neighbours].sum(axis=0) / 4
+    if factors is not None:
+        new *= factors
+    flat[cells] = new
+    return np.max(np.abs(new - old))
+
+
+def _neighbour_sum(matrix, out):
+    """
+    Writes the sum of the four neighbours of every unknown (rows 1..n-2, columns 0..n-2) into out,
+    with column 0 taking column n-2 as its west neighbour (periodic in x).
+    """
+    inner = out[:, 1:]
+    np.add(matrix[:-2, 1:-1], matrix[2:, 1:-1], out=inner)
+    np.add(inner, matrix[1:-1, :-2], out=inner)
+    np.add(inner, matrix[1:-1, 2:], out=inner)
+    edge = out[:, 0]
+    np.add(matrix[:-2, 0], matrix[2:, 0], out=edge)
+    np.add(edge, matrix[1:-1, 1], out=edge)
+    np.add(edge, matrix[1:-1, -2], out=edge)
+    return out
+
+
+def _diffusion_step(matrix, next_matrix, cons, scratch=None):
+    """One explicit step of the diffusion equation from matrix into next_matrix, only writes the unknowns."""
+    if scratch is None:
+        scratch = np.empty_like(matrix[1:-1, :-1])
+    unknowns = next_matrix[1:-1, :-1]
+    _neighbour_sum(matrix, unknowns)
+    np.multiply(unknowns, cons, out=unknowns)
+    np.multiply(matrix[1:-1, :-1], 1 - 4*cons, out=scratch)
+    np.add(unknowns, scratch, out=unknowns)
+    next_matrix[1:-1, -1] = next_matrix[1:-1, 0]
+
+
+def _jacobi_step(matrix, next_matrix, weights):
+    """One Jacobi iteration from matrix into next_matrix, weights is mask/4 on the unknowns."""
+    unknowns = next_matrix[1:-1, :-1]
+    _neighbour_sum(matrix, unknowns)
+    np.multiply(unknowns, weights, out=unknowns)
+    next_matrix[1:-1, -1] = next_matrix[1:-1, 0]
+
+
+def _adi_step(matrix, next_matrix, cons):
+    """
+    One Peaceman-Rachford ADI step of the diffusion equation, second order in time and stable for every cons.
+    First half step implicit in x (periodic, a cyclic tridiagonal solve per row) and explicit in y,
+    then implicit in y (rows 0 and n-1 fixed, a tridiagonal solve per column) and explicit in x.
+    """
+    half = cons / 2
+    unknowns = matrix[1:-1, :-1]
+    width = unknowns.shape[1]
+
+    # half step 1: (1 - half d_xx) u* = (1 + half d_yy) u
+    rhs = unknowns + half * (matrix[:-2, :-1] - 2*unknowns + matrix[2:, :-1])
+    half_step = np.copy(matrix)
+    half_step[1:-1, :-1] = _cyclic_tridiagonal(-half, 1 + 2*half, -half, rhs.T).T
+    half_step[1:-1, -1] = half_step[1:-1, 0]
+
+    # half step 2: (1 - half d_yy) u = (1 + half d_xx) u*
+    inner = half_step[1:-1, :-1]
+    west = np.roll(inner, 1, axis=1)
+    east = np.roll(inner, -1, axis=1)
+    rhs = inner + half * (west - 2*inner + east)
+    rhs[0] += half * matrix[0, :width]
+    rhs[-1] += half * matrix[-1, :width]
+    next_matrix[0] = matrix[0]
+    next_matrix[-1] = matrix[-1]
+    next_matrix[1:-1, :-1] = _tridiagonal(-half, np.full(len(rhs), 1 + 2*half), -half, rhs)
+    next_matrix[1:-1, -1] = next_matrix[1:-1, 0]
+
+
+def _tridiagonal(lower, diagonal, upper, rhs):
+    """
+    Thomas algorithm for the systems lower*x[i-1] + diagonal[i]*x[i] + upper*x[i+1] = rhs[i],
+    one system per column of rhs (N, K), all solved at once.
+    """
+    n = len(rhs)
+    factor = np.empty(n)
+    solution = np.empty_like(rhs, dtype=float)
+    factor[0] = upper / diagonal[0]
+    solution[0] = rhs[0] / diagonal[0]
+    for i in range(1, n):
+        denominator = diagonal[i] - lower * factor[i-1]
+        factor[i] = upper / denominator
+        solution[i] = (rhs[i] - lower * solution[i-1]) / denominator
+    for i in range(n-2, -1, -1):
+        solution[i] -= factor[i] * solution[i+1]
+    return solution
+
+
+def _cyclic_tridiagonal(lower, diagonal, upper, rhs):
+    """
+    lower*x[i-1] + diagonal*x[i] + upper*x[i+1] = rhs[i] with periodic corners (x[-1] is x[N-1], x[N] is x[0]),
+    per column of rhs (N, K). Sherman-Morrison: two ordinary tridiagonal solves with a corrected first
+    and last diagonal, the corners are upper in the last row and lower in the first row.
+    """
+    n = len(rhs)
+    gamma = -diagonal
+    diagonals = np.full(n, float(diagonal))
+    diagonals[0] -= gamma
+    diagonals[-1] -= upper * lower / gamma
+    u = np.zeros((n, 1))
+    u[0] = gamma
+    u[-1] = upper
+    both = _tridiagonal(lower, diagonals, upper, np.hstack([rhs, u]))
+    x, z = both[:, :-1], both[:, -1:]
+    correction = (x[0] + lower * x[-1] / gamma) / (1 + z[0] + lower * z[-1] / gamma)
+    return x - z * correction
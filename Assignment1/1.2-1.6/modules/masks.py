@@ -0,0 +1,87 @@
+# Name: masks.py
+# Stores the sinks and insulators of a grid compactly and knows which cells the solvers have to update
+
+import numpy as np
+from functools import lru_cache
+
+
+class Mask:
+    """
+    A mask (0 sink, 0 < mask < 1 insulator, 1 free) as int8 codes plus the values of the insulator cells,
+    instead of a float per cell. It keeps per red-black colour the flat indices of the unknowns that are not
+    a sink, with their neighbours and (only when the colour has insulators) their mask values,
+    so a sweep does no work for the sinks and does not multiply the free cells by 1.
+    np.asarray(mask) gives the dense float mask back, so it can be used everywhere a mask array is used.
+    """
+    SINK, FREE, INSULATOR = 0, 1, 2
+
+    def __init__(self, mask):
+        dense = np.asarray(mask, dtype=float)
+        self.shape = dense.shape
+        self.codes = np.full(self.shape, self.FREE, dtype=np.int8)
+        self.codes[dense == 0] = self.SINK
+        self.codes[(dense != 0) & (dense != 1)] = self.INSULATOR
+        self.insulators = np.flatnonzero(self.codes == self.INSULATOR).astype(np.int32)
+        self.values = dense.reshape(-1)[self.insulators]
+
+        codes = self.codes.reshape(-1)
+        unknowns = np.zeros(self.shape, dtype=bool)
+        unknowns[1:-1, :-1] = True
+        self.sinks = np.flatnonzero(unknowns & (self.codes == self.SINK)).astype(np.int32)
+        self.phases = []
+        for cells, neighbours in _red_black_phases(self.shape):
+            active = codes[cells] != self.SINK
+            cells = cells[active].astype(np.int32)
+            factors = dense.reshape(-1)[cells] if np.any(codes[cells] == self.INSULATOR) else None
+            self.phases.append((cells, neighbours[:, active].astype(np.int32), factors))
+
+    @classmethod
+    def of(cls, mask, shape):
+        """mask as a Mask, None is a grid without sinks"""
+        if isinstance(mask, cls):
+            return mask
+        if mask is None:
+            mask = np.ones(shape)
+        return cls(mask)
+
+    def __array__(self, dtype=None, copy=None):
+        dense = (self.codes != self.SINK).astype(float)
+        dense.reshape(-1)[self.insulators] = self.values
+        return dense if dtype is None else dense.astype(dtype)
+
+    def clear_sinks(self, flat):
+        """Sets the sinks of the flat grid to 0 and returns the largest change that made"""
+        if len(self.sinks) == 0:
+            return 0
+        error = np.max(np.abs(flat[self.sinks]))
+        flat[self.sinks] = 0
+        return error
+
+
+@lru_cache(maxsize=None)
+def _red_black_phases(shape, offset=0):
+    """
+    Splits the unknowns of an (n x n) grid into colours that can be updated at the same time.
+    Row 0 and row n-1 are fixed, the last column is a copy of the first (periodic in x),
+    so the unknowns are rows 1..n-2 and columns 0..n-2. Returns per colour the flat indices
+    of the cells and a (4, k) array with the flat indices of their neighbours.
+    With an odd periodic width the last unknown column touches column 0 of the same colour,
+    so it gets its own two colours, which are empty for an even width.
+    offset is the row of the whole grid that row 0 of shape is, so a strip of rows gets the same colours.
+    """
+    n_rows, n_cols = shape
+    width = n_cols - 1
+    rows, cols = np.mgrid[1:n_rows-1, 0:width]
+    colour = (rows + offset + cols) % 2
+    seam = (cols == width - 1) & (width % 2 == 1)
+
+    phases = []
+    for selection in [(colour == 0) & ~seam, (colour == 1) & ~seam, (colour == 0) & seam, (colour == 1) & seam]:
+        i = rows[selection]
+        j = cols[selection]
+        neighbours = np.array([(i-1) * n_cols + j,
+                               (i+1) * n_cols + j,
+                               i * n_cols + (j+1) % width,
+                               i * n_cols + (j-1) % width]).reshape(4, -1)
+        phases.append((i * n_cols + j, neighbours))
+    return tuple(phases)
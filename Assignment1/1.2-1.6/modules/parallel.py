@@ -0,0 +1,128 @@
+# Name: parallel.py
+# Jacobi and red-black SOR on large grids, split in row strips over worker processes with shared memory
+
+import os
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+import numpy as np
+from .functions import _neighbour_sum, _relax_phase
+from .masks import _red_black_phases
+
+
+def strips(n_rows, workers):
+    """Splits the unknown rows 1..n-2 into (start, stop) strips of (almost) the same size"""
+    edges = np.linspace(1, n_rows - 1, workers + 1).round().astype(int)
+    return [(int(start), int(stop)) for start, stop in zip(edges[:-1], edges[1:]) if stop > start]
+
+
+def _attach(name, shape):
+    memory = shared_memory.SharedMemory(name=name)
+    return memory, np.ndarray(shape, dtype=float, buffer=memory.buf)
+
+
+def _worker(k, rows, names, shape, workers, barrier, method, omega, tol, max_iterations):
+    """
+    Solves the rows start..stop-1 of the grids in shared memory. Every strip also reads the row above and
+    below it (the halo), which belong to the neighbouring strips or are the fixed boundary rows.
+    The strip has all columns, so the periodic x-direction stays inside it. After every colour (SOR)
+    or sweep (Jacobi) all workers meet at the barrier, so the halo rows they read are up to date.
+    The largest change of every strip goes into a shared array and every worker takes the maximum,
+    so they all stop after the same iteration.
+    """
+    start, stop = rows
+    blocks = [_attach(name, size) for name, size in zip(names, [shape, shape, shape, (3, workers)])]
+    current, following, mask, errors = (array for _, array in blocks)
+    weights = mask[start:stop, :-1] / 4
+
+    if method == "sor":
+        view = current[start-1:stop+1]
+        flat = view.reshape(-1)
+        mask_flat = mask[start-1:stop+1].reshape(-1)
+        phases = [(cells, neighbours, mask_flat[cells]) for cells, neighbours in _red_black_phases(view.shape, start - 1)]
+
+    iterations = 0
+    error = tol + 10
+    while error > tol and iterations < max_iterations:
+        if method == "sor":
+            local = 0
+            for cells, neighbours, factors in phases:
+                local = max(local, _relax_phase(flat, omega, factors, cells, neighbours))
+                barrier.wait()
+            current[start:stop, -1] = current[start:stop, 0]
+        else:
+            unknowns = following[start:stop, :-1]
+            _neighbour_sum(current[start-1:stop+1], unknowns)
+            np.multiply(unknowns, weights, out=unknowns)
+            following[start:stop, -1] = following[start:stop, 0]
+            local = np.max(np.abs(following[start:stop, :-1] - current[start:stop, :-1]))
+            current, following = following, current
+
+        # two slots so a worker that is ahead can not overwrite the errors others are still reading
+        errors[iterations % 2, k] = local
+        barrier.wait()
+        error = np.max(errors[iterations % 2])
+        iterations += 1
+    errors[2, k] = iterations
+
+    del current, following, mask, errors, weights
+    if method == "sor":
+        del view, flat, mask_flat
+    for memory, _ in blocks:
+        memory.close()
+
+
+def parallel_solve(matrix, tol, method="jacobi", omega=1.5, mask=None, workers=None, max_iterations=10**8):
+    """
+    Jacobi (method="jacobi", like Jacob_Eq_TOL) or red-black SOR (method="sor", like SOR_Eq_TOL) with the
+    unknown rows split over workers processes (default the number of cores). The grids live in shared memory,
+    so per sweep only the halo rows are read from the neighbouring strips and nothing is copied between processes.
+    mask works like in the functions (0 sink, 0 < mask < 1 insulator).
+    Returns the solution and the number of iterations.
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    if mask is None:
+        mask = np.ones_like(matrix)
+    if workers is None:
+        workers = os.cpu_count()
+    parts = strips(len(matrix), workers)
+
+    sizes = [matrix.nbytes, matrix.nbytes, matrix.nbytes, 3 * len(parts) * 8]
+    blocks = [shared_memory.SharedMemory(create=True, size=size) for size in sizes]
+    try:
+        arrays = [np.ndarray(shape, dtype=float, buffer=block.buf)
+                  for block, shape in zip(blocks, [matrix.shape, matrix.shape, matrix.shape, (3, len(parts))])]
+        arrays[0][...] = matrix
+        arrays[1][...] = matrix
+        arrays[2][...] = mask
+        arrays[3][...] = 0
+
+        context = mp.get_context()
+        barrier = context.Barrier(len(parts))
+        names = [block.name for block in blocks]
+        # the barrier can only be given to processes when they are started, not through a Pool
+        processes = [context.Process(target=_worker, args=(k, rows, names, matrix.shape, len(parts), barrier,
+                                                          method, omega, tol, max_iterations))
+                     for k, rows in enumerate(parts)]
+        for process in processes:
+            process.start()
+        running = list(processes)
+        while running:
+            wait([process.sentinel for process in running])
+            finished = [process for process in running if process.exitcode is not None]
+            if any(process.exitcode != 0 for process in finished):
+                # the other workers would wait at the barrier forever, abort lets them stop with an error
+                barrier.abort()
+            running = [process for process in running if process not in finished]
+        if any(process.exitcode != 0 for process in processes):
+            raise RuntimeError("A worker of parallel_solve failed")
+
+        iterations = int(arrays[3][2, 0])
+        # Jacobi swaps the two grids every sweep
+        solution = arrays[iterations % 2 if method == "jacobi" else 0].copy()
+        del arrays
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return solution, iterations
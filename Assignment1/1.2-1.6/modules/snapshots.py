@@ -0,0 +1,138 @@
+# Name: snapshots.py
+# Streams snapshots of long time dependent runs to disk in memory-mapped chunks
+
+import json
+import os
+
+import numpy as np
+
+
+class SnapshotStore:
+    """
+    A folder with meta.json (shape, dtype, dt, dx, chunk size and count) and chunk files of preallocated
+    memory-mapped arrays, every chunk holds `chunk` snapshots and their step index.
+    Snapshots can be full fields or profiles, as long as they all have the same shape.
+    Reading a slice or a time range only opens the chunks that are needed.
+    """
+
+    def __init__(self, path, meta, mode):
+        self.path = path
+        self.meta = meta
+        self.mode = mode
+        self._chunks = {}
+
+    @classmethod
+    def create(cls, path, shape, dtype=float, dt=None, dx=None, chunk=256):
+        """
+        New store in path. Chunks left in the folder by an earlier store are removed,
+        so running a driver again into the same folder starts from an empty store.
+        """
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name.startswith("chunk_") and name.endswith(".npy"):
+                os.remove(os.path.join(path, name))
+        meta = {"shape": list(shape), "dtype": np.dtype(dtype).str, "dt": dt, "dx": dx, "chunk": chunk, "count": 0}
+        store = cls(path, meta, "w")
+        store._write_meta()
+        return store
+
+    @classmethod
+    def open(cls, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            return cls(path, json.load(f), "r")
+
+    def __len__(self):
+        return self.meta["count"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def steps(self):
+        """Step index of every snapshot"""
+        return self._read(0, len(self), "steps")
+
+    @property
+    def times(self):
+        """Time of every snapshot, needs the dt the store was created with"""
+        if self.meta["dt"] is None:
+            raise ValueError("The store has no dt, use steps instead of times")
+        return self.steps * self.meta["dt"]
+
+    def append(self, step, snapshot):
+        if self.mode != "w":
+            raise ValueError("The store is opened for reading")
+        idx = self.meta["count"]
+        data, steps = self._chunk(idx // self.meta["chunk"])
+        data[idx % self.meta["chunk"]] = snapshot
+        steps[idx % self.meta["chunk"]] = step
+        self.meta["count"] += 1
+        if self.meta["count"] % self.meta["chunk"] == 0:
+            self.flush()
+
+    def __getitem__(self, key):
+        """store[i] or store[i:j] gives the snapshots, only reading the chunks in that range"""
+        if isinstance(key, slice):
+            indices = range(*key.indices(len(self)))
+            if len(indices) == 0:
+                return self._read(0, 0, "data")
+            # read the covered range once (also for negative steps) and take every stride-th from it
+            low = min(indices[0], indices[-1])
+            return self._read(low, max(indices[0], indices[-1]) + 1, "data")[np.asarray(indices) - low]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(key)
+        return self._read(key, key + 1, "data")[0]
+
+    def between(self, t_start, t_end):
+        """(times, snapshots) with t_start <= time <= t_end, needs dt like times"""
+        times = self.times
+        start = np.searchsorted(times, t_start, side="left")
+        stop = np.searchsorted(times, t_end, side="right")
+        return times[start:stop], self[start:stop]
+
+    def flush(self):
+        for data, steps in self._chunks.values():
+            data.flush()
+            steps.flush()
+        self._write_meta()
+
+    def close(self):
+        if self.mode == "w":
+            self.flush()
+        self._chunks.clear()
+
+    def _read(self, start, stop, which):
+        chunk = self.meta["chunk"]
+        shape = tuple(self.meta["shape"]) if which == "data" else ()
+        dtype = np.dtype(self.meta["dtype"]) if which == "data" else np.int64
+        out = np.empty((max(stop - start, 0),) + shape, dtype=dtype)
+        for c in range(start // chunk, (stop - 1) // chunk + 1 if stop > start else start // chunk):
+            data, steps = self._chunk(c)
+            source = data if which == "data" else steps
+            lo = max(start, c * chunk)
+            hi = min(stop, (c + 1) * chunk)
+            out[lo - start:hi - start] = source[lo - c * chunk:hi - c * chunk]
+        return out
+
+    def _chunk(self, c):
+        if c not in self._chunks:
+            name = os.path.join(self.path, f"chunk_{c:05d}")
+            if self.mode == "w" and not os.path.exists(name + ".npy"):
+                shape = (self.meta["chunk"],) + tuple(self.meta["shape"])
+                data = np.lib.format.open_memmap(name + ".npy", mode="w+", dtype=self.meta["dtype"], shape=shape)
+                steps = np.lib.format.open_memmap(name + "_steps.npy", mode="w+", dtype=np.int64, shape=(self.meta["chunk"],))
+            else:
+                file_mode = "r+" if self.mode == "w" else "r"
+                data = np.load(name + ".npy", mmap_mode=file_mode)
+                steps = np.load(name + "_steps.npy", mmap_mode=file_mode)
+            self._chunks[c] = (data, steps)
+        return self._chunks[c]
+
+    def _write_meta(self):
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(self.meta, f)
@@ -0,0 +1,154 @@
+# Name: stepper.py
+# Time stepping for the diffusion equation and Jacobi without allocating a new matrix every step
+
+import numpy as np
+from .functions import _adi_step, _diffusion_step, _jacobi_step, _relax
+from .masks import Mask
+from .snapshots import SnapshotStore
+
+
+class Stepper:
+    """
+    Owns two preallocated buffers and swaps them after every step, the update is done in place
+    with out= ufuncs so advancing does not allocate any arrays.
+    method = "explicit" is the time dependent diffusion equation (TDDE_Eq, needs dt, dx and D),
+    method = "adi" is the same equation with the implicit ADI scheme, which has no limit on dt,
+    method = "jacobi" is the Jacobi iteration (TIDE_Eq, optionally with a mask),
+    method = "sor" is red-black SOR (SOR_Eq, omega = 1 is Gauss_Eq), which updates in place.
+    The rows 0 and n-1 are kept fixed, like in the functions.
+    """
+
+    def __init__(self, matrix, dt=None, dx=None, D=1, method="explicit", mask=None, omega=1.5):
+        self.current = np.array(matrix, dtype=float)
+        self.next = np.copy(self.current)
+        self.scratch = np.empty_like(self.current[1:-1, :-1])
+        self.method = method
+        self.dt = dt
+        self.dx = dx
+        self.steps = 0
+
+        if method == "explicit":
+            self.cons = dt*D/(dx**2)
+            if self.cons > 1/4:
+                raise ValueError(f"Unstable: dt*D/dx**2 = {self.cons} is larger than 1/4")
+        elif method == "adi":
+            self.cons = dt*D/(dx**2)
+        elif method == "jacobi":
+            if mask is None:
+                mask = np.ones_like(self.current)
+            self.weights = np.asarray(mask, dtype=float)[1:-1, :-1] / 4
+        elif method == "sor":
+            self.mask = Mask.of(mask, self.current.shape)
+            self.omega = omega
+        else:
+            raise ValueError(f"Unknown method {method}")
+
+    @property
+    def matrix(self):
+        """The current state. This is one of the buffers, copy it when it has to be kept."""
+        return self.current
+
+    @property
+    def time(self):
+        return self.steps * self.dt
+
+    def step(self, steps=1):
+        """Advances the given number of steps and returns the current state."""
+        for _ in range(steps):
+            if self.method == "explicit":
+                _diffusion_step(self.current, self.next, self.cons, self.scratch)
+                self.current, self.next = self.next, self.current
+            elif self.method == "adi":
+                _adi_step(self.current, self.next, self.cons)
+                self.current, self.next = self.next, self.current
+            elif self.method == "jacobi":
+                _jacobi_step(self.current, self.next, self.weights)
+                self.current, self.next = self.next, self.current
+            else:
+                _relax(self.current, self.omega, self.mask)
+        self.steps += steps
+        return self.current
+
+
+def integrate(stepper, steps, select=None, path=None, chunk=256):
+    """
+    Runs the stepper and yields (step, snapshot) only for the requested step counts.
+    The steps in between are done in one stepper.step call, so there is no check every step.
+    select picks what to keep of the state (for example lambda m: m[::-1, 0]), default the whole matrix.
+    With path the snapshots are also streamed into a SnapshotStore folder (with dt, dx and the step index).
+    """
+    steps = sorted(set(int(step) for step in steps))
+    if steps and steps[0] < stepper.steps:
+        raise ValueError(f"Step {steps[0]} is before the current step {stepper.steps}")
+    if select is None:
+        select = lambda matrix: matrix
+
+    store = None
+    try:
+        for step in steps:
+            stepper.step(step - stepper.steps)
+            snapshot = np.array(select(stepper.matrix))
+            if path is not None:
+                if store is None:
+                    store = SnapshotStore.create(path, snapshot.shape, snapshot.dtype, stepper.dt, stepper.dx, chunk)
+                store.append(step, snapshot)
+            yield step, snapshot
+    finally:
+        if store is not None:
+            store.close()
+
+
+
+def adaptive(matrix, dx, D=1, tol=1e-4, dt=None, steady=1e-3, times=None, method="adi", max_steps=10**6):
+    """
+    Diffusion equation with an adaptive dt (step doubling): every step is done once with dt and twice with dt/2,
+    the largest difference between the two is the error estimate. The step is kept when it is below tol
+    (the two half steps are the result) and dt is grown or shrunk with it. With method = "explicit" dt stays
+    below the stable limit dx**2/(4D), method = "adi" has no limit.
+    Stops after the last of times, or when steady is given and the largest change per unit time drops below it.
+    Returns the matrix, the time reached, the number of accepted steps and a copy of the matrix at every
+    one of times that was reached (dt is cut to land exactly on them).
+    """
+    current = np.array(matrix, dtype=float)
+    full = np.copy(current)
+    half = np.copy(current)
+    double = np.copy(current)
+    scratch = np.empty_like(current[1:-1, :-1])
+    limit = dx**2 / (4*D) if method == "explicit" else np.inf
+    order = 1 if method == "explicit" else 2
+    times = sorted(times) if times is not None else []
+    if dt is None:
+        dt = dx**2 / (4*D)
+
+    def advance(source, target, dt):
+        if method == "explicit":
+            _diffusion_step(source, target, dt*D/dx**2, scratch)
+        else:
+            _adi_step(source, target, dt*D/dx**2)
+
+    time = 0.0
+    steps = 0
+    snapshots = []
+    while steps < max_steps and (len(snapshots) < len(times) or (not times and steady is not None)):
+        step = min(dt, limit)
+        target = times[len(snapshots)] if len(snapshots) < len(times) else np.inf
+        step = min(step, target - time)
+
+        advance(current, full, step)
+        advance(current, half, step / 2)
+        advance(half, double, step / 2)
+        error = np.max(np.abs(double - full))
+        # grow at most 2 times, shrink at most 5 times, with a safety factor
+        dt = step * min(2, max(0.2, 0.9 * (tol / max(error, 1e-300))**(1 / (order + 1))))
+        if error > tol:
+            continue
+
+        change = np.max(np.abs(double - current))
+        current, double = double, current
+        time += step
+        steps += 1
+        if time >= target:
+            snapshots.append(np.copy(current))
+        if steady is not None and change / step < steady:
+            break
+    return current, time, steps, snapshots
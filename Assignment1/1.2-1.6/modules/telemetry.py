@@ -0,0 +1,49 @@
+# Name: telemetry.py
+# Optional records of how a solve is going (residual, omega, time, cells updated) every so many iterations
+
+import json
+import time
+
+
+class Telemetry:
+    """
+    Pass it as telemetry= to a solver. Every `every` iterations the solver calls record, which gives sink a dict
+    with the solver, the event ("iteration", at the end "converged" or "stalled" when the iteration cap was hit),
+    the iteration, the residual (largest change of that sweep), the elapsed seconds and what the solver adds
+    (omega, cells updated so far). The default sink keeps the records in self.records.
+    Without a Telemetry the solvers only check `telemetry is not None` once per iteration.
+    """
+
+    def __init__(self, sink=None, every=100):
+        self.records = []
+        self.sink = sink if sink is not None else self.records.append
+        self.every = every
+        self.solver = None
+        self.fields = {}
+        self.started = time.perf_counter()
+
+    def start(self, solver, **fields):
+        self.solver = solver
+        self.fields = fields
+        self.started = time.perf_counter()
+
+    def record(self, iteration, residual, event="iteration", **fields):
+        record = {"solver": self.solver, "event": event, "iteration": int(iteration), "residual": float(residual),
+                  "elapsed": time.perf_counter() - self.started}
+        record.update(self.fields)
+        record.update(fields)
+        self.sink(record)
+
+
+class JsonLines:
+    """Sink that appends every record as one line of json to path, flushed so a running solve can be followed"""
+
+    def __init__(self, path):
+        self.file = open(path, "a")
+
+    def __call__(self, record):
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
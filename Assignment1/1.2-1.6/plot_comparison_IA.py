@@ -2,19 +2,18 @@
 # Makes a plot comparing the numerical discrete solutions to the analytical solution
 import numpy as np
 import matplotlib.pyplot as plt
-from modules.functions import TIDE_Eq, Gauss_Eq, SOR_Eq
+from modules.stepper import Stepper, integrate
 from modules.error_analytical import analytical_solution
+from modules.cache import cached
 
-def generate():
+def generate(n, frames_to_save):
     #initialize the matrix
-    n = 50
     matrix = np.zeros((n,n))
     matrix[0] = 1
     matrix[-1] = 0
     dx = 1/n
     dt = (dx**2)/4
     time = 1
-    frames_to_save = [10, 100, 1000, 10000]
     y_J = []
     y_G = []
     y_S = []
@@ -22,48 +21,31 @@ def generate():
     x = np.linspace(0, 1, n)
     dt_ = []
 
-    matrix2 = np.copy(matrix)
-    matrix3 = np.copy(matrix)
-    matrix4 = np.copy(matrix)
+    steppers = [Stepper(matrix, method="jacobi"),
+                Stepper(matrix, method="sor", omega=1),
+                Stepper(matrix, method="sor", omega=1.5),
+                Stepper(matrix, method="sor", omega=1.8)]
+    runs = [integrate(stepper, frames_to_save, select=lambda m: m[::-1, 0]) for stepper in steppers]
 
     #run the diffusion while saving our four cases
-    for i in range(10001):
-        matrix = TIDE_Eq(matrix)
-        matrix2 = Gauss_Eq(matrix2)
-        matrix3 = SOR_Eq(matrix3)
-        matrix4 = SOR_Eq(matrix4, 1.8)
-        if i in frames_to_save:
-            y_J.append(matrix[::-1, 0])
-            y_G.append(matrix2[::-1, 0])
-            y_S.append(matrix3[::-1, 0])
-            y_S2.append(matrix4[::-1, 0])
-            dt_.append(dt * i)
+    for (i, j), (_, g), (_, s), (_, s2) in zip(*runs):
+        y_J.append(j)
+        y_G.append(g)
+        y_S.append(s)
+        y_S2.append(s2)
+        dt_.append(dt * i)
 
-    #save the resulting data
-    np.save("data/x_values.npy", x)
-    np.save("data/y_values_J.npy", y_J)
-    np.save("data/y_values_G.npy", y_G)
-    np.save("data/y_values_S.npy", y_S)
-    np.save("data/y_values_S2.npy", y_S2)
-    np.save("data/dt_values.npy", dt_)
-    np.save("data/frames_to_save.npy", frames_to_save)
+    return {"x_values": x, "y_values_J": y_J, "y_values_G": y_G, "y_values_S": y_S, "y_values_S2": y_S2,
+            "dt_values": dt_, "frames_to_save": frames_to_save}
 
 
-try: 
-    x = np.load("data/x_values.npy")
-    y_J = np.load("data/y_values_J.npy")
-    y_G = np.load("data/y_values_G.npy")
-    y_S = np.load("data/y_values_S.npy")
-    y_S2 = np.load("data/y_values_S2.npy")
-    dt_ = np.load("data/dt_values.npy")
-except FileNotFoundError:
-    generate()
-    x = np.load("data/x_values.npy")
-    y_J = np.load("data/y_values_J.npy")
-    y_G = np.load("data/y_values_G.npy")
-    y_S = np.load("data/y_values_S.npy")
-    y_S2 = np.load("data/y_values_S2.npy")
-    dt_ = np.load("data/dt_values.npy")
+data = cached(generate, n=50, frames_to_save=[10, 100, 1000, 10000])
+x = data["x_values"]
+y_J = data["y_values_J"]
+y_G = data["y_values_G"]
+y_S = data["y_values_S"]
+y_S2 = data["y_values_S2"]
+dt_ = data["dt_values"]
 
 D = 1
 
@@ -1,49 +1,29 @@
 from modules.functions import Jacob_Eq_TOL, Gauss_Eq_TOL, SOR_Eq_TOL
 import numpy as np
+from modules.cache import cached
 import matplotlib.pyplot as plt
 
 
-def generate():
+def generate(n, tolerances):
     #initialize the matrix
-    n = 50
     matrix = np.zeros((n,n))
     matrix[0] = 1
     matrix[-1] = 0
 
-    # make list of tolerances
-    tolerances = [10**-i for i in range(1, 8)]
-    jacob_iterations = []
-    gauss_iterations = []
-    sor_iterations = []
-    sor2_iterations = []
-
-    # run the three methods for each tolerance
-    for tol in tolerances:
-        jacob_iterations.append(Jacob_Eq_TOL(matrix, tol))
-        gauss_iterations.append(Gauss_Eq_TOL(matrix, tol))
-        sor_iterations.append(SOR_Eq_TOL(matrix, tol))
-        sor2_iterations.append(SOR_Eq_TOL(matrix, tol, 1.8))
-
-    # save the data
-    np.save("data/tolerances1.npy", tolerances)
-    np.save("data/jacob_iterations1.npy", jacob_iterations)
-    np.save("data/gauss_iterations1.npy", gauss_iterations)
-    np.save("data/sor_iterations1.npy", sor_iterations)
-    np.save("data/sor2_iterations1.npy", sor2_iterations)
-
-try:
-    tolerances = np.load("data/tolerances1.npy")
-    jacob_iterations = np.load("data/jacob_iterations1.npy")
-    gauss_iterations = np.load("data/gauss_iterations1.npy")
-    sor_iterations = np.load("data/sor_iterations1.npy")
-    sor2_iterations = np.load("data/sor2_iterations1.npy")
-except FileNotFoundError:
-    generate()
-    tolerances = np.load("data/tolerances1.npy")
-    jacob_iterations = np.load("data/jacob_iterations1.npy")
-    gauss_iterations = np.load("data/gauss_iterations1.npy")
-    sor_iterations = np.load("data/sor_iterations1.npy")
-    sor2_iterations = np.load("data/sor2_iterations1.npy")
+    # one run per method gives the iterations for every tolerance
+    return {"tolerances": tolerances,
+            "jacob_iterations": Jacob_Eq_TOL(matrix, tolerances),
+            "gauss_iterations": Gauss_Eq_TOL(matrix, tolerances),
+            "sor_iterations": SOR_Eq_TOL(matrix, tolerances),
+            "sor2_iterations": SOR_Eq_TOL(matrix, tolerances, 1.8)}
+
+# only computed when there is no result for these parameters and this solver code yet
+data = cached(generate, n=50, tolerances=[10**-i for i in range(1, 8)])
+tolerances = data["tolerances"]
+jacob_iterations = data["jacob_iterations"]
+gauss_iterations = data["gauss_iterations"]
+sor_iterations = data["sor_iterations"]
+sor2_iterations = data["sor2_iterations"]
 
 # plot the results
 l = np.linspace(1,7,7)
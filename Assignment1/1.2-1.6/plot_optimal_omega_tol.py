@@ -3,42 +3,28 @@
 
 import numpy as np 
 from modules.functions import SOR_Eq_TOL
+from modules.cache import cached
 import matplotlib.pyplot as plt
 
 
-def save_data():
+def save_data(n, omega_values, tol):
     #initialize the matrix
-    n = 50
     matrix = np.zeros((n,n))
     matrix[0] = 1
     matrix[-1] = 0
-    omega_values = np.linspace(0.001, 1.999, 8)
-    tol = np.linspace(1, 7, 7)
     iterations = []
 
     # run the SOR method for each omega value
     for omega in omega_values:
         print(omega)
-        for t in tol:
-            iterations.append(SOR_Eq_TOL(matrix, 10**-t, omega))
+        iterations.extend(SOR_Eq_TOL(matrix, [10**-t for t in tol], omega))
     print("DONE")
-    # plot the 8 lines
-    # save the data
-    np.save("data/omega_values.npy", omega_values)
-    np.save("data/tol_values.npy", tol)
-    np.save("data/iterations.npy", iterations)
-    return True
-
-try:
-    tol = np.load("data/tol_values.npy")
-    iterations = np.load("data/iterations.npy")
-    omega_values = np.load("data/omega_values.npy")
-except FileNotFoundError:
-    save_data()
-    tol = np.load("data/tol_values.npy")
-    iterations = np.load("data/iterations.npy")
-    omega_values = np.load("data/omega_values.npy")
+    return {"omega_values": omega_values, "tol_values": tol, "iterations": iterations}
 
+data = cached(save_data, n=50, omega_values=np.linspace(0.001, 1.999, 8).tolist(), tol=np.linspace(1, 7, 7).tolist())
+tol = data["tol_values"]
+iterations = data["iterations"]
+omega_values = data["omega_values"]
 
 
 for i in range(8):
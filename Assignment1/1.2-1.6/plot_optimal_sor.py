@@ -2,43 +2,22 @@
 import numpy as np
 import matplotlib.pyplot as plt
 from modules.functions import SOR_Eq_TOL
-from scipy.optimize import minimize_scalar
+from modules.omega import optimal_omega
+from modules.cache import cached
 
-# load the data
-def generate():
-        
+def generate(n, tol):
     #initialize the matrix
-    n = [10,30,50,100,200]
-    iterations = []
-    tol = 10**-5
-    lb = 1
-    for i in n:
-        matrix = np.zeros((i, i))
-        matrix[0] = 1
-        matrix[-1] = 0
-        # use scipy's minimize_scalar method to find the optimal omega for a certain n
+    matrix = np.zeros((n, n))
+    matrix[0] = 1
+    matrix[-1] = 0
+    # the optimal omega follows from the spectral radius of the Jacobi iteration
+    omega = optimal_omega(matrix.shape)
+    print(omega)
+    return {"omega": omega, "iterations": SOR_Eq_TOL(matrix, tol, omega)}
 
-        def f(omega):
-            return SOR_Eq_TOL(matrix, tol, omega)
-        
-        result = minimize_scalar(f, bounds=(1, 2), method='bounded', options={'xatol': 1e-3})
-        omega = result.x
-        print(omega)
-        lb = omega
-        iterations.append(result.fun)
-
-    # save the data
-    np.save("data/n_values.npy", n)
-    np.save("data/iterations_optimal.npy", iterations)
-
-try: 
-    n_values = np.load("data/n_values.npy")
-    iterations = np.load("data/iterations_optimal.npy")
-
-except FileNotFoundError:
-    generate()
-    n_values = np.load("data/n_values.npy")
-    iterations = np.load("data/iterations_optimal.npy")
+# every matrix size is cached on its own, so adding a size only computes that one
+n_values = [10,30,50,100,200]
+iterations = [cached(generate, n=n, tol=10**-5)["iterations"] for n in n_values]
 
 plt.plot(n_values, iterations, linestyle="-", marker="o")
 plt.xlabel("Matrix size")
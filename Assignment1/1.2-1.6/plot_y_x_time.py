@@ -4,51 +4,39 @@
 import numpy as np
 import matplotlib.pyplot as plt
 from modules.error_analytical import analytical_solution
-from modules.functions import TDDE_Eq
+from modules.stepper import Stepper, integrate
+from modules.cache import cached
 
 
 show_analytic = True
 
-def generate():
+def generate(n, frames_to_save):
     y_top= 1
     y_bottom = 0
     y_left = y_right = 0
-    n = 50
     dx = 1/n
     dt = (dx**2)/4
     print(dt)
     y = [] 
-    frames_to_save = [10, 100, 1000, 10000]
     domain = np.zeros((n ,n))
     domain[0, :] = 1
     x = np.linspace(0, 1, n)
     dt_ = []
+    stepper = Stepper(domain, dt, dx, 1)
 
     #run the diffusion while saving our four cases 
-    for i in range(10001):
-        domain = TDDE_Eq(domain, dt, dx, 1)
-        if i in frames_to_save:
-            y.append(domain[::-1, 0])
-            dt_.append(dt * i)
-
-    #save the resulting data
-    np.save("data/x_valuesTTD.npy", x)
-    np.save("data/y_valuesTTD.npy", y)
-    np.save("data/dt_valuesTTD.npy", dt_)
-    np.save("data/frames_to_saveTTD.npy", frames_to_save)
-
-# check if data files are there
-try:
-    x = np.load("data/x_valuesTTD.npy")
-    y = np.load("data/y_valuesTTD.npy")
-    dt_ = np.load("data/dt_valuesTTD.npy")
-    frames_to_save = np.load("data/frames_to_saveTTD.npy")
-except:
-    generate()
-    x = np.load("data/x_valuesTTD.npy")
-    y = np.load("data/y_valuesTTD.npy")
-    dt_ = np.load("data/dt_valuesTTD.npy")
-    frames_to_save = np.load("data/frames_to_saveTTD.npy")
+    for step, profile in integrate(stepper, frames_to_save, select=lambda m: m[::-1, 0]):
+        y.append(profile)
+        dt_.append(dt * step)
+
+    return {"x_valuesTTD": x, "y_valuesTTD": y, "dt_valuesTTD": dt_, "frames_to_saveTTD": frames_to_save}
+
+# only computed when there is no result for these parameters and this solver code yet
+data = cached(generate, n=50, frames_to_save=[10, 100, 1000, 10000])
+x = data["x_valuesTTD"]
+y = data["y_valuesTTD"]
+dt_ = data["dt_valuesTTD"]
+frames_to_save = data["frames_to_saveTTD"]
 
 
 plt.figure(figsize=(8, 6))
@@ -3,7 +3,7 @@
 
 import numpy as np
 from modules.functions import SOR_Eq_TOL, Jacob_Eq_TOL, Gauss_Eq_TOL
-from scipy.optimize import minimize_scalar
+from modules import omega
 
 grid = np.zeros((50,50))
 grid[0] = 1
@@ -27,11 +27,8 @@ mask_i3[35:40, 35:40] = 0.95
 
 
 def calculate_min_omega(matrix, tol,mask):
-    def f(omega):
-        return SOR_Eq_TOL(matrix, tol, omega, mask=mask)
-    
-    result = minimize_scalar(f, bounds=(1, 2), method='bounded', options={'xatol': 1e-3})
-    return result.x
+    # closed form from the spectral radius of the masked Jacobi operator, no search over full solves
+    return omega.optimal_omega(matrix.shape, mask)
 
 # THIS MAKES A LATEX TABLE NICE TO JUST COPY IN TO THE REPORT YOU KNOW
 print("\textbf{Jacobi} & \textbf{Gauss-Seidel} & \textbf{SOR $\omega$ = 1.8} & \textbf{Optimal $\omega$} \\\\")
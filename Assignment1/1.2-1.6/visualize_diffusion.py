@@ -3,14 +3,16 @@
 
 import numpy as np
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-from modules.functions import TDDE_Eq, TIDE_Eq, Gauss_Eq
+from modules.stepper import Stepper
+from modules.animate import live, record
 
 y_top= 1
 y_bottom = 0
 y_left = y_right = 0
 step_t = 1/10000
 step_x = 1/50
+# set to a .mp4/.gif file or a folder to write the frames there instead of showing a window
+save_to = None
 
 #function to initialize the nxn matrix with only first line being 1 and rest 0
 def initialize_matrix(n):
@@ -19,26 +21,18 @@ def initialize_matrix(n):
     return matrix
 
 
-
-def update(frame):
-    global matrix
-    matrix = TDDE_Eq(matrix, step_t, step_x, 1)
-    im.set_array(matrix)
-    return [im]
-
-def on_close(event):
-    ani.event_source.stop() 
-
 matrix = initialize_matrix(50)
+stepper = Stepper(matrix, step_t, step_x, 1)
 
 fig, ax = plt.subplots()
 im = ax.imshow(matrix, cmap="hot", interpolation="nearest")
 
-# BE ABLE TO CLOSE
-fig.canvas.mpl_connect("close_event", on_close)
-
-ani = FuncAnimation(fig, update, frames=1000, interval=0.1, blit=False)
-
 plt.yticks([0, 25], [0, 0.5])
 plt.xticks([0, 50], [0, 1])
-plt.show() 
\ No newline at end of file
+
+if save_to is None:
+    # the solver runs in a thread, the window shows the newest step it has
+    ani = live(fig, im, stepper.step, frames=1000, interval=0.1)
+    plt.show() 
+else:
+    record(stepper.step, 1000, save_to, fig=fig, im=im, dt=step_t, dx=step_x)
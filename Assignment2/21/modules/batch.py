@@ -0,0 +1,52 @@
+import time
+
+import numpy as np
+from .functions import grow_cluster
+
+'''
+Checks what adding k particles per solve (grow_cluster(..., k=k)) does to the clusters compared to k = 1.
+The same seeds are used for every k, the difference of the mean of every statistic with k = 1 is given
+in standard errors, so a k can be picked that saves solves without changing the clusters beyond the noise.
+'''
+
+
+def cluster_stats(contour):
+    '''Height, width (columns used), radius of gyration and perimeter (number of candidates) of the cluster'''
+    n = len(contour)
+    rows, cols = np.nonzero(contour == 1)
+    # columns relative to the seed column, periodic with width n-1
+    width = n - 1
+    cols = (cols % width - n//2 + width//2) % width - width//2
+    return {"height": rows.max() - rows.min() + 1,
+            "width": len(np.unique(cols)),
+            "gyration": np.sqrt(np.var(rows) + np.var(cols)),
+            "perimeter": np.count_nonzero(contour == 2)}
+
+
+def compare_batch(omega, eta, ks, repeats=10, N=250, n=100, seed=0):
+    '''
+    Grows repeats clusters for k = 1 and every k in ks (numbers or functions of the cluster size).
+    Returns per k the mean and standard deviation of cluster_stats, the mean solves, sor sweeps and seconds,
+    and per statistic (mean_k - mean_1) / standard error of that difference.
+    '''
+    results = {}
+    for k in [1] + [k for k in ks if k != 1]:
+        stats, solves, sweeps, seconds = [], [], [], []
+        for r in range(repeats):
+            start = time.perf_counter()
+            _, contour, solve_count, sweep_count, _ = grow_cluster(omega, eta, N, n, k=k, seed=seed + r)
+            seconds.append(time.perf_counter() - start)
+            stats.append(cluster_stats(contour))
+            solves.append(solve_count)
+            sweeps.append(sweep_count)
+        values = {key: np.array([s[key] for s in stats], dtype=float) for key in stats[0]}
+        results[k] = {"mean": {key: v.mean() for key, v in values.items()},
+                      "std": {key: v.std(ddof=1) for key, v in values.items()},
+                      "solves": np.mean(solves), "sweeps": np.mean(sweeps), "seconds": np.mean(seconds)}
+
+    reference = results[1]
+    for result in results.values():
+        result["bias"] = {key: (result["mean"][key] - reference["mean"][key])
+                          / max(np.sqrt((result["std"][key]**2 + reference["std"][key]**2) / repeats), 1e-12)
+                          for key in reference["mean"]}
+    return results
@@ -0,0 +1,136 @@
+import numpy as np
+
+'''
+Index of the candidate cells of the DLA cluster (contour == 2) with their weights c**eta.
+The weights are kept in a Fenwick (binary indexed) tree, so adding, removing or changing a
+candidate and drawing a weighted sample are O(log k) for k candidates.
+'''
+
+
+class CandidateIndex:
+
+    def __init__(self, capacity=64):
+        self.size = 0
+        self.cells = np.zeros((capacity, 2), dtype=np.int64)
+        self.weights = np.zeros(capacity)
+        self.tree = np.zeros(capacity)
+        self.slots = {}
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, cell):
+        return tuple(cell) in self.slots
+
+    def __iter__(self):
+        return (tuple(cell) for cell in self.cells[:self.size])
+
+    @property
+    def total(self):
+        return self._prefix(self.size)
+
+    def add(self, cell, weight=0.0):
+        '''Adds a candidate, does nothing if it is already there'''
+        cell = tuple(cell)
+        if cell in self.slots:
+            return
+        if self.size == len(self.weights):
+            self._grow()
+        slot = self.size
+        self.size += 1
+        self.slots[cell] = slot
+        self.cells[slot] = cell
+        self.weights[slot] = 0
+        self._add(slot, weight)
+
+    def discard(self, cell):
+        '''Removes a candidate (if present) by moving the last candidate into its slot'''
+        slot = self.slots.pop(tuple(cell), None)
+        if slot is None:
+            return
+        last = self.size - 1
+        if slot != last:
+            moved = tuple(self.cells[last])
+            self._add(slot, self.weights[last] - self.weights[slot])
+            self.cells[slot] = self.cells[last]
+            self.slots[moved] = slot
+        self._add(last, -self.weights[last])
+        self.size -= 1
+
+    def update(self, cell, weight):
+        slot = self.slots[tuple(cell)]
+        self._add(slot, weight - self.weights[slot])
+
+    def refresh(self, domain, eta):
+        '''
+        Recomputes all weights c**eta from the domain and rebuilds the tree in O(k) with numpy.
+        Needed after every solve, because a new cluster cell changes the concentration everywhere.
+        '''
+        rows, cols = self.cells[:self.size].T
+        self.weights[:] = 0
+        self.weights[:self.size] = np.abs(domain[rows, cols])**eta
+        self._build()
+
+    def sample(self, rng=None):
+        '''Draws a candidate with probability weight/total, None when no candidate has a weight'''
+        total = self.total
+        if total <= 0:
+            return None
+        u = (rng.random() if rng is not None else np.random.random()) * total
+        slot = 0
+        step = 1 << (len(self.tree).bit_length() - 1)
+        while step:
+            nxt = slot + step
+            if nxt <= len(self.tree) and self.tree[nxt-1] <= u:
+                slot = nxt
+                u -= self.tree[nxt-1]
+            step >>= 1
+        return tuple(self.cells[min(slot, self.size - 1)])
+
+    def sample_many(self, k, rng=None):
+        '''
+        Draws k different candidates (fewer when there are not enough with a weight), every draw with
+        probability weight/total of the ones that are not drawn yet. The drawn ones keep weight 0 until refresh.
+        '''
+        drawn = []
+        for _ in range(min(k, self.size)):
+            if self.total <= 0:
+                break
+            cell = self.sample(rng)
+            if cell is None:
+                break
+            slot = self.slots[cell]
+            if self.weights[slot] <= 0:
+                # only left over rounding in the tree
+                break
+            drawn.append(cell)
+            self._add(slot, -self.weights[slot])
+        return drawn
+
+    def _add(self, slot, delta):
+        self.weights[slot] += delta
+        i = slot + 1
+        while i <= len(self.tree):
+            self.tree[i-1] += delta
+            i += i & -i
+
+    def _prefix(self, count):
+        total = 0.0
+        i = count
+        while i > 0:
+            total += self.tree[i-1]
+            i -= i & -i
+        return total
+
+    def _build(self):
+        # tree[i-1] holds the sum of the weights (i - lowbit(i), i]
+        i = np.arange(1, len(self.tree) + 1)
+        cumulative = np.concatenate(([0], np.cumsum(self.weights)))
+        self.tree[:] = cumulative[i] - cumulative[i - (i & -i)]
+
+    def _grow(self):
+        capacity = 2 * len(self.weights)
+        self.cells = np.concatenate((self.cells, np.zeros_like(self.cells)))
+        self.weights = np.concatenate((self.weights, np.zeros(capacity - len(self.weights))))
+        self.tree = np.zeros(capacity)
+        self._build()
@@ -1,5 +1,6 @@
 import numpy as np
-from numba import njit
+from numba import njit, prange
+from .candidates import CandidateIndex
 
 def analytical_start(domain):
     domain[0, :] = 1
@@ -16,6 +17,7 @@ def update_contour(candidate_loc, contour, domain, candidates):
     x, y = candidate_loc
     domain[x, y] = 0
     contour[x, y] = 1
+    candidates.discard((x, y))
 
     neighbors = []
     if x > 0:
@@ -30,16 +32,28 @@ def update_contour(candidate_loc, contour, domain, candidates):
     for i, j in neighbors:
         if contour[i, j] == 0:
             contour[i, j] = 2
-            candidates.append((i, j))
+            candidates.add((i, j))
     return contour, candidates
 
-def aggregate_candidate(candidates, domain, eta):
-    a = np.array([(np.abs(domain[i, j]))**eta for i, j in candidates])
-    prob_cand = a / np.sum(a)
-    # print(prob_cand)
-    return candidates[np.random.choice(len(candidates), p=prob_cand)]
+def aggregate_candidate(candidates, domain, eta, rng=None):
+    # the weights c**eta change after every solve, the index rebuilds them in one numpy pass
+    candidates.refresh(domain, eta)
+    return candidates.sample(rng)
 
-@njit
+def aggregate_candidates(candidates, domain, eta, k, rng=None):
+    # k candidates for one solve, without replacement
+    candidates.refresh(domain, eta)
+    return candidates.sample_many(k, rng)
+
+def batch_size(k, size, left):
+    '''
+    How many particles to add before the next solve, k is a fixed number or a function of the cluster size
+    (for example lambda size: max(1, size // 20)). k = 1 is one solve per particle.
+    '''
+    k = k(size) if callable(k) else k
+    return max(1, min(int(k), left))
+
+@njit(cache=True)
 def SOR_Eq(matrix, omega, mask):
     new_matrix = matrix.copy()
 
@@ -53,7 +67,7 @@ def SOR_Eq(matrix, omega, mask):
             new_matrix[i,-1] = new_matrix[i,0]
     return new_matrix
 
-@njit
+@njit(cache=True)
 def sor(domain, contour, w, eps=1e-5):
     conv = 1
     iter_count = 0
@@ -66,53 +80,368 @@ def sor(domain, contour, w, eps=1e-5):
 
     return domain, iter_count
 
-def next_step(domain, contour, candidates, eta, w):
-    cand = aggregate_candidate(candidates, domain, eta)
-    contour, candidates = update_contour(cand, contour, domain, candidates=candidates)
-    domain, iter = sor(domain, contour,w)
+@njit(parallel=True, cache=True)
+def SOR_Eq_parallel(matrix, omega, mask):
+    '''
+    One red-black SOR sweep in place, the rows of one colour are spread over the cores with prange.
+    The columns are periodic with width n-1 (the last column is a copy of the first). With an odd width
+    the last of those columns touches column 0 of the same colour, so it is done in two extra passes.
+    Returns the largest change.
+    '''
+    n = len(matrix)
+    width = n - 1
+    seam = width % 2 == 1
+    last = width - 1 if seam else width
+    change = np.zeros(n)
+    for colour in range(4):
+        if colour > 1 and not seam:
+            break
+        for i in prange(1, n-1):
+            if colour < 2:
+                start = (i + colour) % 2
+                stop = last
+            else:
+                # only the seam column, when its cell has this colour
+                start = width - 1 if (i + width - 1) % 2 == colour - 2 else width
+                stop = width
+            for j in range(start, stop, 2):
+                if mask[i, j] == 1 or (j == 0 and mask[i, -1] == 1):
+                    continue
+                new = (1-omega) * matrix[i, j] + omega * (matrix[i+1, j] + matrix[i-1, j] + matrix[i, (j+1) % width] + matrix[i, (j-1) % width]) / 4
+                change[i] = max(change[i], abs(new - matrix[i, j]))
+                matrix[i, j] = new
+    for i in range(1, n-1):
+        if mask[i, -1] != 1:
+            matrix[i, -1] = matrix[i, 0]
+    return np.max(change)
+
+@njit(cache=True)
+def sor_parallel(domain, contour, w, eps=1e-5):
+    domain = domain.copy()
+    conv = 1
+    iter_count = 0
+    while conv > eps:
+        conv = SOR_Eq_parallel(domain, w, contour)
+        iter_count += 1
+    return domain, iter_count
+
+@njit(cache=True)
+def sor_local(domain, contour, w, seed, eps=1e-5, radius=4):
+    '''
+    Warm started SOR that only relaxes a window around seed (the cell that just joined the cluster).
+    The window is solved until the largest change is below eps. If a cell on its border moved more than eps
+    the perturbation reaches further, so the window doubles and is solved again, up to the whole domain.
+    Outside the window the previous solution is kept. Returns the new domain and the number of cell updates.
+    '''
+    domain = domain.copy()
+    n = len(domain)
+    width = n - 1
+    x, y = seed[0], seed[1] % width
+    updates = 0
+
+    while True:
+        top = max(1, x - radius)
+        bottom = min(n-2, x + radius)
+        full = 2 * radius + 1 >= width
+        left = 0 if full else y - radius
+        right = width - 1 if full else y + radius
+        start = domain[top:bottom+1].copy()
+
+        conv = 1
+        while conv > eps:
+            conv = 0
+            for i in range(top, bottom+1):
+                for k in range(left, right+1):
+                    j = k % width
+                    if contour[i, j] == 1 or (j == 0 and contour[i, -1] == 1):
+                        continue
+                    new = (1-w) * domain[i, j] + w * (domain[i+1, j] + domain[i-1, j] + domain[i, (j+1) % width] + domain[i, (j-1) % width]) / 4
+                    conv = max(conv, abs(new - domain[i, j]))
+                    domain[i, j] = new
+                    if j == 0:
+                        domain[i, -1] = new
+                    updates += 1
+
+        if top == 1 and bottom == n-2 and full:
+            break
+        # how far did the border of the window move
+        drift = 0
+        for i in range(top, bottom+1):
+            for k in range(left, right+1):
+                border = (i == top and top > 1) or (i == bottom and bottom < n-2) or (not full and (k == left or k == right))
+                if border:
+                    drift = max(drift, abs(domain[i, k % width] - start[i - top, k % width]))
+        if drift <= eps:
+            break
+        radius *= 2
+    return domain, updates
+
+@njit(cache=True)
+def sor_steps(domain, contour, w, eps, steps, conv=1.0):
+    '''At most steps iterations of sor (stops earlier when converged), returns the domain, the iterations and the last change'''
+    iter_count = 0
+    while conv > eps and iter_count < steps:
+        next_domain = SOR_Eq(domain, w, contour)
+        conv = np.max(np.abs(next_domain - domain))
+        domain = next_domain
+        iter_count += 1
+    return domain, iter_count, conv
+
+@njit(parallel=True, cache=True)
+def SOR_Eq_ensemble(domains, omega, masks, active):
+    '''
+    One SOR_Eq sweep in place on every active member of a (B, n, n) stack of domains (masks are the contours),
+    the members are spread over the cores with prange. omega has one value per member.
+    Returns the largest change of every member (0 for the ones that are not active).
+    '''
+    B, n = domains.shape[0], domains.shape[1]
+    change = np.zeros(B)
+    for b in prange(B):
+        if not active[b]:
+            continue
+        matrix = domains[b]
+        mask = masks[b]
+        w = omega[b]
+        largest = 0.0
+        for i in range(1, n-1):
+            for j in range(1, n-1):
+                if mask[i, j] == 0 or mask[i, j] == 2:
+                    new = (1-w) * matrix[i,j] + w * (matrix[i+1,j] + matrix[i-1,j] + matrix[i,j+1] + matrix[i,j-1])/4
+                    largest = max(largest, abs(new - matrix[i, j]))
+                    matrix[i, j] = new
+            if mask[i, 0] == 0 or mask[i, 0] == 2:
+                new = (1-w) * matrix[i,0] + w * (matrix[i-1,0] + matrix[i+1,0] + matrix[i,1] + matrix[i,n-2]) / 4
+                largest = max(largest, abs(new - matrix[i, 0]))
+                matrix[i, 0] = new
+            if mask[i, n-1] == 0 or mask[i, n-1] == 2:
+                largest = max(largest, abs(matrix[i, 0] - matrix[i, n-1]))
+                matrix[i, n-1] = matrix[i, 0]
+        change[b] = largest
+    return change
+
+@njit(cache=True)
+def sor_ensemble(domains, contours, w, eps=1e-5, active=None):
+    '''
+    sor on every member of the stack at once (w has one omega per member). A member that converged is flagged
+    and not swept anymore, so every member gets the same domain and iteration count as sor on its own.
+    active (default all) are the members to solve, the others are left as they are.
+    Returns the domains and the (B,) iterations.
+    '''
+    domains = domains.copy()
+    B = domains.shape[0]
+    if active is None:
+        active = np.ones(B, dtype=np.bool_)
+    else:
+        active = active.copy()
+    iterations = np.zeros(B, dtype=np.int64)
+    while np.any(active):
+        change = SOR_Eq_ensemble(domains, w, contours, active)
+        for b in range(B):
+            if active[b]:
+                iterations[b] += 1
+                if change[b] <= eps:
+                    active[b] = False
+    return domains, iterations
+
+def sor_traced(domain, contour, w, eps=1e-5, telemetry=None, parallel=False):
+    '''
+    sor (or sor_parallel) that gives telemetry a record every telemetry.every iterations and one at the end.
+    In between the iterations run in numba, so the domain and the iteration count are the same as without.
+    '''
+    telemetry.start("sor_parallel" if parallel else "sor", n=len(domain))
+    cells = int(np.sum(contour[1:-1] != 1))
+    iter_count = 0
+    conv = 1.0
+    if parallel:
+        domain = domain.copy()
+    while conv > eps:
+        if parallel:
+            conv = SOR_Eq_parallel(domain, w, contour)
+            iter_count += 1
+        else:
+            domain, done, conv = sor_steps(domain, contour, w, eps, telemetry.every - iter_count % telemetry.every, conv)
+            iter_count += done
+        if iter_count % telemetry.every == 0 or conv <= eps:
+            event = "converged" if conv <= eps else "iteration"
+            telemetry.record(iter_count, conv, event, omega=w, cells=iter_count * cells)
+    return domain, iter_count
+
+def next_step(domain, contour, candidates, eta, w, local=False, rng=None, telemetry=None, k=1, parallel=False):
+    if k == 1:
+        cand = aggregate_candidate(candidates, domain, eta, rng)
+        batch = [] if cand is None else [cand]
+    else:
+        batch = aggregate_candidates(candidates, domain, eta, k, rng)
+    if not batch:
+        # no candidate has a weight, nothing changes
+        return domain, contour, candidates, 0
+    for cand in batch:
+        contour, candidates = update_contour(cand, contour, domain, candidates=candidates)
+    if local:
+        # one warm started local solve around every new cell
+        iter = 0
+        for cand in batch:
+            domain, updates = sor_local(domain, contour, w, np.array(cand))
+            iter += updates
+    elif telemetry is not None:
+        domain, iter = sor_traced(domain, contour, w, telemetry=telemetry, parallel=parallel)
+    elif parallel:
+        domain, iter = sor_parallel(domain, contour, w)
+    else:
+        domain, iter = sor(domain, contour,w)
     return domain, contour, candidates, iter
 
-def test_run_iterations(omega, eta):
+def test_run_iterations(omega, eta, seed=None, telemetry=None, k=1, parallel=False):
+    # with a seed the run uses its own np.random.Generator instead of the global random state
+    # parallel uses the red-black sor_parallel, which converges in a different number of iterations
+    rng = None if seed is None else np.random.default_rng(seed)
     n = 100 
     eta = eta 
     N = 100 
     domain = np.zeros((n, n))
     domain[0, :] = 1
     domain[-1, :] = 0
-    contour = np.zeros((n, n))
+    contour = np.zeros((n, n), dtype=np.int8)
     domain = analytical_start(domain)
-    contour, candidates = update_contour([n-1, n//2], contour, domain, [])
-    domain, iter = sor(domain, contour, omega)
-    # print(iter)
-    iterations = iter
-    for k in range(N):
-        domain, contour, candidates,iter= next_step(domain, contour, candidates, eta, omega)
-        iterations += iter
+    contour, candidates = update_contour([n-1, n//2], contour, domain, CandidateIndex())
+    _, _, _, iterations, _ = grow(domain, contour, candidates, omega, eta, N, k, rng=rng, telemetry=telemetry, parallel=parallel)
     return iterations
 
-def run(omega, eta):
-    n = 100 # grid length (once squared)
-    eta = eta # shape parameter
-    N = 250
+def run(omega, eta, local=False, seed=None, telemetry=None, k=1, parallel=False):
+    domain, contour, _, _, _ = grow_cluster(omega, eta, 250, k=k, local=local, seed=seed, telemetry=telemetry, parallel=parallel)
+    return domain, contour
+
+def grow_cluster(omega, eta, N=250, n=100, k=1, local=False, seed=None, telemetry=None, parallel=False):
+    '''run for N particles on an n x n grid, also returns the number of solves, sor sweeps and sor_local cell updates'''
+    rng = None if seed is None else np.random.default_rng(seed)
     domain = np.zeros((n, n))
     domain[0, :] = 1
     domain[-1, :] = 0
-    contour = np.zeros((n, n))
-    contour, candidates = update_contour([n-2, n//2], contour, domain, candidates=[])
-    domain, iter = sor(domain, contour, omega)
-    # print(iter)
-    for k in range(N):
-        domain, contour, candidates,_= next_step(domain, contour, candidates, eta, omega)
-    return domain, contour
+    contour = np.zeros((n, n), dtype=np.int8)
+    contour, candidates = update_contour([n-2, n//2], contour, domain, candidates=CandidateIndex())
+    return grow(domain, contour, candidates, omega, eta, N, k, local, rng, telemetry, parallel)
+
+def grow(domain, contour, candidates, omega, eta, N, k=1, local=False, rng=None, telemetry=None, parallel=False):
+    '''
+    Solves the start domain and adds N particles to the cluster, batch_size(k, ...) of them per solve
+    (fewer when there are not enough candidates with a weight, it stops early when there are none).
+    Returns the domain, the contour, the number of solves, the sweeps of the global sor solves
+    and the cell updates of the sor_local solves (0 without local).
+    With parallel the global solves use sor_parallel, spread over the cores.
+    '''
+    if telemetry is not None:
+        domain, iterations = sor_traced(domain, contour, omega, telemetry=telemetry, parallel=parallel)
+    elif parallel:
+        domain, iterations = sor_parallel(domain, contour, omega)
+    else:
+        domain, iterations = sor(domain, contour, omega)
+    updates = 0
+    size = np.count_nonzero(contour == 1)
+    target = size + N
+    solves = 1
+    while size < target:
+        batch = batch_size(k, size, target - size)
+        domain, contour, candidates, iter = next_step(domain, contour, candidates, eta, omega, local, rng, telemetry, batch, parallel)
+        previous, size = size, np.count_nonzero(contour == 1)
+        if size == previous:
+            # no candidate has a weight anymore
+            break
+        if local:
+            updates += iter
+        else:
+            iterations += iter
+        solves += 1
+    return domain, contour, solves, iterations, updates
+
+
+def aggregate_ensemble(domains, contours, eta, active, rng):
+    '''
+    Draws one candidate for every active member of the stack, with probability c**eta over the candidates
+    of that member, for all members in one numpy pass over the candidates of the whole stack.
+    Returns the (B, 2) cells, -1 for members that are not active or have no candidate with a weight.
+    '''
+    B = len(domains)
+    b, i, j = np.nonzero((contours == 2) & active[:, None, None])
+    cumulative = np.cumsum(np.abs(domains[b, i, j])**eta[b])
+    counts = np.bincount(b, minlength=B)
+    stop = np.cumsum(counts)
+    start = stop - counts
+    cells = np.full((B, 2), -1, dtype=np.int64)
+    if len(b) == 0:
+        return cells
+    end = np.where(counts > 0, cumulative[np.maximum(stop - 1, 0)], 0)
+    begin = np.where(start > 0, cumulative[np.maximum(start - 1, 0)], 0)
+    u = begin + rng.random(B) * (end - begin)
+    # rounding can put u on the end of the member, then it gets the last candidate with a weight
+    pick = np.where(u < end, np.searchsorted(cumulative, u, side="right"), np.searchsorted(cumulative, end, side="left"))
+    ok = active & (end > begin)
+    cells[ok, 0] = i[pick[ok]]
+    cells[ok, 1] = j[pick[ok]]
+    return cells
 
+def update_contours(cells, contours, domains, members):
+    '''update_contour for cells[members] of the stack, vectorized over the members'''
+    n = contours.shape[1]
+    i, j = cells[members].T
+    domains[members, i, j] = 0
+    contours[members, i, j] = 1
+    for di, dj in ((-1, 0), (0, -1), (1, 0), (0, 1)):
+        ni, nj = i + di, j + dj
+        inside = (ni >= 0) & (ni < n) & (nj >= 0) & (nj < n)
+        b, ni, nj = members[inside], ni[inside], nj[inside]
+        free = contours[b, ni, nj] == 0
+        contours[b[free], ni[free], nj[free]] = 2
+    return contours
 
-# # start test sor vs analytical
-domain1 = analytical_start(np.zeros((100, 100)))
-domain2 = np.zeros((100, 100))
-domain2[0, :] = 1
-domain2[-1, :] = 0
-domain2, _ = sor(domain2, np.zeros((100, 100)), 1.9)
-# test or the analytical solution is the same as the sor solution
-assert np.allclose(domain1, domain2, atol=1e-2)
+def grow_ensemble(domains, contours, omega, eta, N, rng=None):
+    '''
+    grow (k = 1, not local) for a (B, n, n) stack of domains and contours at once: every round every member
+    gets one particle from aggregate_ensemble and then the whole stack is solved with sor_ensemble.
+    omega and eta are numbers or one value per member. A member without candidates with a weight stops growing.
+    Returns the domains, the contours and the (B,) total sor iterations.
+    '''
+    rng = rng if rng is not None else np.random.default_rng()
+    B = len(domains)
+    omega = np.broadcast_to(np.asarray(omega, dtype=np.float64), (B,)).copy()
+    eta = np.broadcast_to(np.asarray(eta, dtype=np.float64), (B,))
+    domains, iterations = sor_ensemble(domains, contours, omega)
+    growing = np.ones(B, dtype=bool)
+    for _ in range(N):
+        cells = aggregate_ensemble(domains, contours, eta, growing, rng)
+        growing &= cells[:, 0] >= 0
+        if not np.any(growing):
+            break
+        contours = update_contours(cells, contours, domains, np.flatnonzero(growing))
+        domains, iter = sor_ensemble(domains, contours, omega, 1e-5, growing)
+        iterations += iter
+    return domains, contours, iterations
+
+def grow_clusters(omega, eta, repeats=20, N=250, n=100, seed=None):
+    '''repeats clusters like grow_cluster (k = 1, not local) as one ensemble, returns the domains, contours and iterations'''
+    domains = np.zeros((repeats, n, n))
+    domains[:, 0, :] = 1
+    contours = np.zeros((repeats, n, n), dtype=np.int8)
+    contours = update_contours(np.full((repeats, 2), [n-2, n//2]), contours, domains, np.arange(repeats))
+    return grow_ensemble(domains, contours, omega, eta, N, np.random.default_rng(seed))
+
+def test_run_iterations_ensemble(omega, eta, repeats=20, seed=None):
+    '''test_run_iterations for repeats runs as one ensemble, returns the (repeats,) iterations'''
+    n = 100
+    domains = np.broadcast_to(analytical_start(np.zeros((n, n))), (repeats, n, n)).copy()
+    contours = np.zeros((repeats, n, n), dtype=np.int8)
+    contours = update_contours(np.full((repeats, 2), [n-1, n//2]), contours, domains, np.arange(repeats))
+    _, _, iterations = grow_ensemble(domains, contours, omega, eta, 100, np.random.default_rng(seed))
+    return iterations
 
 
+def check_sor(n=100, w=1.9):
+    # the sor solution without a cluster has to be the linear analytical solution
+    domain1 = analytical_start(np.zeros((n, n)))
+    domain2 = np.zeros((n, n))
+    domain2[0, :] = 1
+    domain2[-1, :] = 0
+    domain2, _ = sor(domain2, np.zeros((n, n), dtype=np.int8), w)
+    assert np.allclose(domain1, domain2, atol=1e-2)
+    domain3, _ = sor_parallel(domain2, np.zeros((n, n), dtype=np.int8), w)
+    assert np.allclose(domain1, domain3, atol=1e-2)
+    return True
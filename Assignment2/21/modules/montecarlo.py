@@ -0,0 +1,126 @@
+import numpy as np
+from scipy.ndimage import distance_transform_edt
+
+'''
+Monte Carlo (random walker) version of the DLA model, with many walkers moved at once as numpy arrays.
+The grid is n x n with row 0 at the top, periodic in x (width n), and the cluster starts as one cell at the
+bottom middle like run in functions.py. Walkers start `launch` rows above the highest cluster cell and are
+started again when they get more than `kill` rows above it or walk off the bottom. A walker next to the
+cluster sticks with probability stick, otherwise it keeps walking (it never walks into the cluster).
+
+Far from the cluster a walker does not walk cell by cell: dist holds the (euclidean, periodic in x) distance
+to the nearest cluster cell, capped at `far`, and a walker at distance d >= jump moves to a random point
+on the circle of radius d - 2 around it, which can not touch the cluster, in one step.
+The distance map is computed once and then only updated in a window around every cell that sticks.
+The walkers do not see each other, with many walkers some of them walk while the cluster grows under them
+instead of one at a time, which does not change the shape noticeably as long as walkers << cluster size.
+'''
+
+
+def distance_map(cluster, far):
+    '''Distance of every cell to the nearest cluster cell, periodic in x, capped at far'''
+    padded = np.pad(~cluster, ((0, 0), (far, far)), mode="wrap")
+    dist = distance_transform_edt(padded)[:, far:-far]
+    return np.minimum(dist, far).astype(np.float32)
+
+
+class Walkers:
+
+    def __init__(self, n, count, stick=1.0, launch=10, kill=None, jump=4, far=32, rng=None):
+        self.n = n
+        self.stick = stick
+        self.launch = launch
+        self.kill = kill if kill is not None else 3 * launch
+        self.jump = jump
+        self.far = far
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        self.cluster = np.zeros((n, n), dtype=bool)
+        self.cluster[n-1, n//2] = True
+        self.size = 1
+        self.top = n - 1
+        self.dist = distance_map(self.cluster, far)
+        offsets = np.arange(-far, far + 1)
+        self.window = np.sqrt(offsets[:, None]**2 + offsets[None, :]**2).astype(np.float32)
+        self.offsets = offsets
+
+        self.rows = np.empty(count, dtype=np.int64)
+        self.cols = np.empty(count, dtype=np.int64)
+        self.relaunch(np.arange(count))
+
+    def relaunch(self, which):
+        self.rows[which] = max(0, self.top - self.launch)
+        self.cols[which] = self.rng.integers(0, self.n, len(which))
+
+    def add(self, i, j):
+        '''Adds (i, j) to the cluster and lowers the distances in the window around it'''
+        self.cluster[i, j] = True
+        self.size += 1
+        self.top = min(self.top, i)
+        rows = np.arange(max(0, i - self.far), min(self.n, i + self.far + 1))
+        cols = (j + self.offsets) % self.n
+        window = self.window[rows - i + self.far]
+        block = self.dist[rows[:, None], cols[None, :]]
+        self.dist[rows[:, None], cols[None, :]] = np.minimum(block, window)
+
+    def step(self, limit=None):
+        '''
+        Moves every walker once (a long jump or one lattice step) and lets the ones next to the cluster stick,
+        until the cluster has limit cells. Returns how many stuck.
+        '''
+        rows, cols, n = self.rows, self.cols, self.n
+        d = self.dist[rows, cols]
+
+        # never further down than the bottom row, walking off the bottom has to happen cell by cell
+        radius = np.minimum(d - 2, n - 1 - rows)
+        far = (d >= self.jump) & (radius >= 2)
+        if np.any(far):
+            radius = radius[far]
+            angle = self.rng.uniform(0, 2*np.pi, len(radius))
+            rows[far] = np.rint(rows[far] + radius * np.sin(angle)).astype(np.int64)
+            cols[far] = np.rint(cols[far] + radius * np.cos(angle)).astype(np.int64) % n
+
+        near = ~far
+        direction = self.rng.integers(0, 4, np.count_nonzero(near))
+        new_rows = rows[near] + np.array([-1, 1, 0, 0])[direction]
+        new_cols = (cols[near] + np.array([0, 0, -1, 1])[direction]) % n
+        inside = (new_rows >= 0) & (new_rows < n)
+        # a step into the cluster is not taken
+        blocked = np.zeros(len(new_rows), dtype=bool)
+        blocked[inside] = self.cluster[new_rows[inside], new_cols[inside]]
+        new_rows[blocked] = rows[near][blocked]
+        new_cols[blocked] = cols[near][blocked]
+        rows[near] = new_rows
+        cols[near] = new_cols
+
+        lost = (rows >= n) | (rows < max(0, self.top - self.kill)) | (rows < 0)
+        self.relaunch(np.flatnonzero(lost))
+
+        touching = np.flatnonzero(self.dist[rows, cols] == 1)
+        if self.stick < 1:
+            touching = touching[self.rng.random(len(touching)) < self.stick]
+        stuck = 0
+        for k in touching:
+            if limit is not None and self.size >= limit:
+                break
+            if not self.cluster[rows[k], cols[k]]:
+                self.add(rows[k], cols[k])
+                stuck += 1
+        if len(touching):
+            self.relaunch(touching)
+            # walkers that were on a cell that just joined the cluster start again as well
+            self.relaunch(np.flatnonzero(self.cluster[rows, cols]))
+        return stuck
+
+
+def mc_dla(n, particles, walkers=1000, stick=1.0, launch=10, kill=None, jump=4, far=32, seed=None, max_steps=10**7):
+    '''
+    Grows a Monte Carlo DLA cluster of particles cells (or until it reaches the top) on an n x n grid
+    with walkers walkers at once. Returns the contour (1 for the cluster, like the contour of run) and the steps.
+    '''
+    state = Walkers(n, walkers, stick, launch, kill, jump, far, np.random.default_rng(seed))
+    steps = 0
+    while state.size < particles and state.top > 1 and steps < max_steps:
+        state.step(particles)
+        steps += 1
+    return state.cluster.astype(np.int8), steps
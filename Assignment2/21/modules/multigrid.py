@@ -0,0 +1,218 @@
+import numpy as np
+from numba import njit
+
+'''
+Geometric multigrid for the Laplace equation of the DLA model (see functions.py for the domain/contour layout).
+Internally a level is an (rows, width) array: row 0 and the last row are the Dirichlet boundaries,
+the columns are periodic without the copied last column of the domain.
+Cells of the cluster (contour == 1) are obstacles, their value is never changed.
+The grids do not have to be a power of two, a coarse grid has about half the points in each direction
+and is connected to the finer grid by linear interpolation.
+'''
+
+
+@njit(cache=True)
+def smooth(u, f, obstacle, hy, hx, w, sweeps):
+    '''
+    The SOR update of SOR_Eq (functions.py) with a right hand side f and grid spacings hy, hx,
+    so it solves (N + S - 2u)/hy**2 + (E + W - 2u)/hx**2 = f. w = 1 is Gauss-Seidel, the best smoother.
+    '''
+    rows, width = u.shape
+    cy = 1 / hy**2
+    cx = 1 / hx**2
+    diag = 2 * cy + 2 * cx
+    for _ in range(sweeps):
+        for i in range(1, rows-1):
+            for j in range(width):
+                if obstacle[i, j]:
+                    continue
+                east = u[i, (j+1) % width]
+                west = u[i, (j-1) % width]
+                new = (cy * (u[i-1, j] + u[i+1, j]) + cx * (east + west) - f[i, j]) / diag
+                u[i, j] = (1 - w) * u[i, j] + w * new
+
+
+@njit(cache=True)
+def residual(u, f, obstacle, hy, hx, r):
+    '''r = f - L u on the unknowns, zero on the boundaries and obstacles'''
+    rows, width = u.shape
+    cy = 1 / hy**2
+    cx = 1 / hx**2
+    r[:] = 0
+    for i in range(1, rows-1):
+        for j in range(width):
+            if obstacle[i, j]:
+                continue
+            east = u[i, (j+1) % width]
+            west = u[i, (j-1) % width]
+            r[i, j] = f[i, j] - (cy * (u[i-1, j] + u[i+1, j] - 2 * u[i, j]) + cx * (east + west - 2 * u[i, j]))
+
+
+@njit(cache=True)
+def prolong(coarse, lo_y, w_y, lo_x, w_x, fine):
+    '''Bilinear interpolation of the coarse grid onto the fine grid, periodic in x'''
+    width_c = coarse.shape[1]
+    for i in range(fine.shape[0]):
+        for j in range(fine.shape[1]):
+            a = lo_y[i]
+            b = lo_x[j]
+            b1 = (b + 1) % width_c
+            top = (1 - w_x[j]) * coarse[a, b] + w_x[j] * coarse[a, b1]
+            if w_y[i] == 0:
+                fine[i, j] = top
+            else:
+                bottom = (1 - w_x[j]) * coarse[a+1, b] + w_x[j] * coarse[a+1, b1]
+                fine[i, j] = (1 - w_y[i]) * top + w_y[i] * bottom
+
+
+@njit(cache=True)
+def restrict(fine, lo_y, w_y, lo_x, w_x, coarse):
+    '''Transpose of prolong, scaled so every coarse value is a weighted average of the fine values'''
+    width_c = coarse.shape[1]
+    weight = np.zeros_like(coarse)
+    coarse[:] = 0
+    for i in range(fine.shape[0]):
+        for j in range(fine.shape[1]):
+            a = lo_y[i]
+            b = lo_x[j]
+            b1 = (b + 1) % width_c
+            for di, wy in ((0, 1 - w_y[i]), (1, w_y[i])):
+                if wy == 0:
+                    continue
+                coarse[a+di, b] += wy * (1 - w_x[j]) * fine[i, j]
+                coarse[a+di, b1] += wy * w_x[j] * fine[i, j]
+                weight[a+di, b] += wy * (1 - w_x[j])
+                weight[a+di, b1] += wy * w_x[j]
+    for i in range(coarse.shape[0]):
+        for j in range(coarse.shape[1]):
+            if weight[i, j] > 0:
+                coarse[i, j] /= weight[i, j]
+
+
+def interpolation(n_fine, n_coarse, periodic):
+    '''Index of the coarse point at or left of every fine point and the weight of the next coarse point'''
+    if periodic:
+        position = np.arange(n_fine) * n_coarse / n_fine
+    else:
+        position = np.arange(n_fine) * (n_coarse - 1) / (n_fine - 1)
+    lo = np.minimum(np.floor(position).astype(np.int64), n_coarse - 1)
+    return lo, position - lo
+
+
+class Level:
+    '''One grid of the hierarchy with its spacing (in fine cells), obstacles and work arrays'''
+
+    def __init__(self, obstacle, hy, hx):
+        self.obstacle = obstacle
+        self.hy = hy
+        self.hx = hx
+        self.u = np.zeros(obstacle.shape)
+        self.f = np.zeros(obstacle.shape)
+        self.r = np.zeros(obstacle.shape)
+
+
+def build_levels(obstacle, min_size=5):
+    '''
+    Coarsens until the grid has less than min_size unknown rows or columns.
+    A coarse point is an obstacle when any fine obstacle is within its interpolation stencil,
+    just like a coarse cell is part of the cluster in improved_sor_iteration_2 when any of its fine cells is.
+    '''
+    levels = [Level(obstacle, 1.0, 1.0)]
+    while True:
+        fine = levels[-1]
+        rows, width = fine.obstacle.shape
+        rows_c = (rows - 2) // 2 + 2
+        width_c = width // 2
+        if rows_c - 2 < min_size or width_c < min_size:
+            break
+        lo_y, w_y = interpolation(rows, rows_c, False)
+        lo_x, w_x = interpolation(width, width_c, True)
+        touched = np.zeros((rows_c, width_c))
+        restrict(fine.obstacle.astype(np.float64), lo_y, w_y, lo_x, w_x, touched)
+        fine.transfer = (lo_y, w_y, lo_x, w_x)
+        hy = fine.hy * (rows - 1) / (rows_c - 1)
+        hx = fine.hx * width / width_c
+        levels.append(Level(touched > 0, hy, hx))
+    return levels
+
+
+def v_cycle(levels, k=0, w=1.0, pre=2, post=2, coarse_sweeps=50):
+    '''One V-cycle on levels[k] for levels[k].u with right hand side levels[k].f'''
+    level = levels[k]
+    if k == len(levels) - 1:
+        smooth(level.u, level.f, level.obstacle, level.hy, level.hx, w, coarse_sweeps)
+        return
+    smooth(level.u, level.f, level.obstacle, level.hy, level.hx, w, pre)
+    residual(level.u, level.f, level.obstacle, level.hy, level.hx, level.r)
+
+    coarse = levels[k+1]
+    restrict(level.r, *level.transfer, coarse.f)
+    coarse.f[coarse.obstacle] = 0
+    coarse.u[:] = 0
+    v_cycle(levels, k+1, w, pre, post, coarse_sweeps)
+
+    prolong(coarse.u, *level.transfer, level.r)
+    level.r[level.obstacle] = 0
+    level.r[0] = 0
+    level.r[-1] = 0
+    level.u += level.r
+    smooth(level.u, level.f, level.obstacle, level.hy, level.hx, w, post)
+
+
+def full_multigrid(levels, top, bottom, w=1.0, pre=2, post=2):
+    '''
+    Solves the problem with boundary values top and bottom on the coarsest grid first and interpolates
+    every solution as the starting guess of the next finer grid, followed by one V-cycle there.
+    '''
+    for level in levels[::-1]:
+        level.u[0] = top
+        level.u[-1] = bottom
+        level.u[level.obstacle] = 0
+        level.f[:] = 0
+
+    v_cycle(levels, len(levels) - 1, w, pre, post)
+    for k in range(len(levels) - 2, -1, -1):
+        level = levels[k]
+        prolong(levels[k+1].u, *level.transfer, level.u)
+        level.u[0] = top
+        level.u[-1] = bottom
+        level.u[level.obstacle] = 0
+        v_cycle(levels, k, w, pre, post)
+
+
+def multigrid(domain, contour, w=1.0, eps=1e-5, cycle="V", pre=2, post=2, max_cycles=100):
+    '''
+    Solves the Laplace equation on domain with the cluster (contour == 1) as sink, like sor in functions.py.
+    cycle = "V" starts from the given domain and does V-cycles, cycle = "FMG" first does a full multigrid pass
+    (this ignores the given domain apart from its first and last row).
+    Stops when the largest change a Jacobi sweep would make, max|residual|/4, is below eps.
+    Returns the domain and the number of cycles.
+    '''
+    obstacle = contour[:, :-1] == 1
+    obstacle[:, 0] |= contour[:, -1] == 1
+    obstacle[0] = False
+    obstacle[-1] = False
+    levels = build_levels(obstacle)
+    fine = levels[0]
+    fine.u[:] = domain[:, :-1]
+    fine.u[obstacle] = domain[:, :-1][obstacle]
+
+    cycles = 0
+    if cycle == "FMG":
+        full_multigrid(levels, domain[0, 0], domain[-1, 0], w, pre, post)
+        fine.u[obstacle] = domain[:, :-1][obstacle]
+        cycles += 1
+    elif cycle != "V":
+        raise ValueError(f"Unknown cycle {cycle}")
+
+    residual(fine.u, fine.f, fine.obstacle, fine.hy, fine.hx, fine.r)
+    while np.max(np.abs(fine.r)) / 4 > eps and cycles < max_cycles:
+        v_cycle(levels, 0, w, pre, post)
+        residual(fine.u, fine.f, fine.obstacle, fine.hy, fine.hx, fine.r)
+        cycles += 1
+
+    domain = np.copy(domain)
+    domain[:, :-1] = fine.u
+    copy = contour[:, -1] != 1
+    domain[copy, -1] = domain[copy, 0]
+    return domain, cycles
@@ -0,0 +1,67 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from .functions import test_run_iterations
+
+'''
+Runs the omega/eta studies of 21.ipynb (gen1, gen2) over a process pool.
+Every (eta, repeat, omega) job gets its own seed from np.random.SeedSequence, so a sweep gives the same
+numbers no matter how the jobs are spread over the workers.
+Results go straight into a .partial.npy file next to the final file (NaN = not done yet) and the final
+file, in the same layout as before (repeat major, omega minor), is written when every job of an eta is done.
+Running the same sweep again only runs the jobs that are still missing.
+'''
+
+
+def job_seed(seed, eta_idx, repeat, omega_idx):
+    return np.random.SeedSequence([seed, eta_idx, repeat, omega_idx])
+
+
+def _job(args):
+    key, omega, eta, seed, parallel = args
+    return key, test_run_iterations(omega, eta, seed=seed, parallel=parallel)
+
+
+def sweep(omegas, etas, repeats, path, seed=0, workers=None, parallel=False):
+    '''
+    path is a format string with {eta}, for example './data/zoomed_omega{eta}1.npy'.
+    Returns a dict of eta to the (repeats * len(omegas)) array of iterations.
+    parallel solves with sor_parallel (use few workers then, every job already uses all cores).
+    It gives different iteration counts, so do not mix it with a sweep that was started without.
+    '''
+    omegas = list(omegas)
+    results = {}
+    jobs = []
+    for e, eta in enumerate(etas):
+        final = path.format(eta=eta)
+        if os.path.exists(final):
+            results[eta] = np.load(final)
+            continue
+        partial = final[:-len('.npy')] + '.partial.npy'
+        if os.path.exists(partial):
+            results[eta] = np.lib.format.open_memmap(partial, mode='r+')
+        else:
+            results[eta] = np.lib.format.open_memmap(partial, mode='w+', dtype=np.float64, shape=(repeats * len(omegas),))
+            results[eta][:] = np.nan
+        for r in range(repeats):
+            for o, omega in enumerate(omegas):
+                if np.isnan(results[eta][r * len(omegas) + o]):
+                    jobs.append(((eta, r * len(omegas) + o), omega, eta, job_seed(seed, e, r, o), parallel))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for future in as_completed([pool.submit(_job, job) for job in jobs]):
+            (eta, idx), iterations = future.result()
+            results[eta][idx] = iterations
+            results[eta].flush()
+
+    for eta in etas:
+        if isinstance(results[eta], np.memmap):
+            final = path.format(eta=eta)
+            done = np.array(results[eta], dtype=np.int64)
+            np.save(final, done)
+            # close the memmap before removing its file
+            del results[eta]
+            os.remove(final[:-len('.npy')] + '.partial.npy')
+            results[eta] = done
+    return {eta: results[eta] for eta in etas}
@@ -0,0 +1,53 @@
+import json
+import time
+
+'''
+Optional records of how a DLA solve is going (residual, omega, time, cells updated) every so many iterations.
+sor can not call back into python from numba, so sor_traced runs it in chunks of `every` sweeps with sor_steps,
+which gives the same domain and iteration count. sor_parallel already sweeps from python and is recorded directly.
+'''
+
+
+class Telemetry:
+    '''
+    Pass it as telemetry= to next_step, grow, run or test_run_iterations, their global solves then go through
+    sor_traced (the local solves of sor_local are not recorded). Every `every` iterations and once at the end
+    sor_traced calls record, which gives sink a dict with the solver, the event ("iteration", or "converged"
+    at the end, sor has no iteration cap), the iteration, the residual (largest change of that sweep),
+    the elapsed seconds and omega and the cells updated so far. The default sink keeps the records in self.records.
+    Without a Telemetry next_step and grow check `telemetry is not None` once per solve and call sor as before.
+    '''
+
+    def __init__(self, sink=None, every=100):
+        self.records = []
+        self.sink = sink if sink is not None else self.records.append
+        self.every = every
+        self.solver = None
+        self.fields = {}
+        self.started = time.perf_counter()
+
+    def start(self, solver, **fields):
+        self.solver = solver
+        self.fields = fields
+        self.started = time.perf_counter()
+
+    def record(self, iteration, residual, event="iteration", **fields):
+        record = {"solver": self.solver, "event": event, "iteration": int(iteration), "residual": float(residual),
+                  "elapsed": time.perf_counter() - self.started}
+        record.update(self.fields)
+        record.update(fields)
+        self.sink(record)
+
+
+class JsonLines:
+    '''Sink that appends every record as one line of json to path, flushed so a running solve can be followed'''
+
+    def __init__(self, path):
+        self.file = open(path, "a")
+
+    def __call__(self, record):
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,203 @@
+# Name: benchmark.py
+# Times the solvers of both assignments over grid sizes, saves a baseline and fails on regressions
+#
+# python benchmarks/benchmark.py                 runs and compares with benchmarks/baseline.json
+# python benchmarks/benchmark.py --save          runs and writes the baseline
+# python benchmarks/benchmark.py --quick --plot scaling.png
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+SIZES = [10, 50, 100, 200, 500, 1000, 2000]
+QUICK_SIZES = [10, 50, 100]
+ASSIGNMENTS = {"assignment1": "Assignment1/1.2-1.6", "assignment2": "Assignment2/21"}
+
+
+def start_grid(n):
+    matrix = np.zeros((n, n))
+    matrix[0] = 1
+    return matrix
+
+
+def timed(function, repeats=1):
+    """Best wall time of repeats calls and the result of the last one"""
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def peak_memory(function):
+    """Largest amount of memory allocated during function (numpy arrays included), in bytes"""
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def cases(assignment, tol):
+    """
+    Every case has a sweep(matrix) that does one sweep or time step and a solve(matrix) that runs to tol
+    and returns the number of iterations (either can be None), and the grid sizes it runs for (None is all).
+    Both assignments have a package called modules, so every assignment runs in its own process
+    with its folder first on the path.
+    """
+    sys.path.insert(0, os.path.join(ROOT, ASSIGNMENTS[assignment]))
+    from modules import functions
+
+    if assignment == "assignment1":
+        return {
+            "jacobi": (lambda m: functions.TIDE_Eq(m), lambda m: functions.Jacob_Eq_TOL(m, tol), None),
+            "gauss": (lambda m: functions.Gauss_Eq(m), lambda m: functions.Gauss_Eq_TOL(m, tol), None),
+            "sor": (lambda m: functions.SOR_Eq(m, 1.8), lambda m: functions.SOR_Eq_TOL(m, tol, 1.8), None),
+            "tdde": (lambda m: functions.TDDE_Eq(m, (1/len(m))**2/4, 1/len(m), 1), None, None),
+        }
+
+    def contour(n):
+        return np.zeros((n, n), dtype=np.int8)
+
+    return {
+        "numba_sor": (lambda m: functions.SOR_Eq(m, 1.8, contour(len(m))),
+                      lambda m: functions.sor(m, contour(len(m)), 1.8, tol)[1], None),
+        # the whole DLA model (run), its grid size is fixed at 100. The iterations are the sor sweeps,
+        # with local the sor_local cell updates
+        "dla_run": (None, lambda m: functions.grow_cluster(1.85, 1, seed=0)[3], [100]),
+        "dla_run_local": (None, lambda m: functions.grow_cluster(1.85, 1, local=True, seed=0)[4], [100]),
+    }
+
+
+def run(assignment, sizes, solve_max, tol, repeats):
+    results = {}
+    all_cases = cases(assignment, tol)
+    # numba compiles (or loads from its cache) on the first call, that is not part of the timing
+    for sweep, solve, fixed in all_cases.values():
+        if sweep is not None:
+            sweep(start_grid(10))
+        if solve is not None and fixed is None:
+            solve(start_grid(10))
+
+    for name, (sweep, solve, fixed) in all_cases.items():
+        for n in fixed or sizes:
+            matrix = start_grid(n)
+            result = {"n": n}
+            if sweep is not None:
+                result["sweep_time"], _ = timed(lambda: sweep(matrix), repeats)
+            if solve is not None and (n <= solve_max or fixed):
+                result["total_time"], iterations = timed(lambda: solve(matrix))
+                if iterations is not None:
+                    result["iterations"] = iterations
+                result["peak_memory"] = peak_memory(lambda: solve(matrix))
+            else:
+                result["peak_memory"] = peak_memory(lambda: sweep(matrix))
+            results[f"{name}/{n}"] = result
+            print(name, result, file=sys.stderr, flush=True)
+    return results
+
+
+def run_all(sizes, solve_max, tol, repeats):
+    """Runs every assignment in a fresh python process (this file with --assignment) and merges the results"""
+    results = {}
+    for assignment in ASSIGNMENTS:
+        command = [sys.executable, os.path.abspath(__file__), "--assignment", assignment, "--sizes", *map(str, sizes),
+                   "--solve-max", str(solve_max), "--tol", str(tol), "--repeats", str(repeats)]
+        output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+        results.update(json.loads(output))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Returns the regressions: times and memory more than threshold times the baseline, or more iterations"""
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        for metric in ["sweep_time", "total_time", "peak_memory", "iterations"]:
+            if metric not in result or metric not in baseline[key]:
+                continue
+            old, new = baseline[key][metric], result[metric]
+            limit = old if metric == "iterations" else old * threshold
+            if new > limit:
+                regressions.append(f"{key} {metric}: {new:.4g} > {limit:.4g} (baseline {old:.4g})")
+    return regressions
+
+
+def plot(results, path):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    curves = {}
+    for key, result in results.items():
+        if "sweep_time" in result:
+            curves.setdefault(key.split("/")[0], []).append((result["n"], result["sweep_time"]))
+    plt.figure(figsize=(7, 5))
+    for name, points in curves.items():
+        n, seconds = zip(*sorted(points))
+        plt.loglog(n, seconds, marker="o", label=name)
+    plt.xlabel("n (grid is n x n)")
+    plt.ylabel("Time per sweep (s)")
+    plt.title("Scaling of one sweep")
+    plt.grid(which="both")
+    plt.legend()
+    plt.savefig(path, dpi=150)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the solvers of both assignments")
+    parser.add_argument("--quick", action="store_true", help=f"only the sizes {QUICK_SIZES}")
+    parser.add_argument("--sizes", type=int, nargs="+", help="grid sizes to run")
+    parser.add_argument("--solve-max", type=int, default=100, help="largest n that is also solved to tol")
+    parser.add_argument("--tol", type=float, default=1e-5)
+    parser.add_argument("--repeats", type=int, default=3, help="the sweep time is the best of this many")
+    parser.add_argument("--threshold", type=float, default=1.3, help="allowed slowdown against the baseline")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--plot", help="save the scaling curves to this file")
+    parser.add_argument("--assignment", choices=ASSIGNMENTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else SIZES)
+    if args.assignment:
+        # one assignment for run_all, the results go to stdout
+        print(json.dumps(run(args.assignment, sizes, args.solve_max, args.tol, args.repeats)))
+        return 0
+    results = run_all(sizes, args.solve_max, args.tol, args.repeats)
+    if args.plot:
+        plot(results, args.plot)
+
+    if args.save:
+        meta = {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+                "processor": platform.processor(), "cores": os.cpu_count(), "tol": args.tol}
+        with open(args.baseline, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=1)
+        print(f"Saved the baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save first")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        print("REGRESSION", regression)
+    if not regressions:
+        print("No regressions")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())